@@ -1,3 +1,5 @@
+import os
+import re
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -9,6 +11,10 @@ from app.models import Base
 # access to the values within the .ini file in use.
 config = context.config
 
+# DATABASE_URL (the app's own setting) wins over the URL in alembic.ini
+if os.environ.get("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.environ["DATABASE_URL"].replace("%", "%%"))
+
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
@@ -19,6 +25,14 @@ if config.config_file_name is not None:
 # from myapp import mymodel
 # target_metadata = mymodel.Base.metadata
 target_metadata = Base.metadata
+
+# Monthly partitions of activity_logs are created by backend.app.partitions, not by migrations
+PARTITION_TABLE = re.compile(r"^activity_logs_(y\d{4}m\d{2}|default)$")
+
+
+def include_name(name, type_, parent_names):
+    return not (type_ == "table" and PARTITION_TABLE.match(name))
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -41,6 +55,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_name=include_name,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -64,7 +79,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_name=include_name
         )
 
         with context.begin_transaction():
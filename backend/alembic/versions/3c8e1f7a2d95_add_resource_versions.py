@@ -0,0 +1,30 @@
+"""Add resource_versions for ETags
+
+Revision ID: 3c8e1f7a2d95
+Revises: 7d3f5a9e0c14
+Create Date: 2026-10-18 14:02:37.518230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e1f7a2d95'
+down_revision: Union[str, None] = '7d3f5a9e0c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('resource_versions',
+    sa.Column('resource', sa.String(), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('resource')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('resource_versions')
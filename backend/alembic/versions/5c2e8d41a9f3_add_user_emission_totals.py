@@ -0,0 +1,43 @@
+"""Add running per-user emission totals
+
+Revision ID: 5c2e8d41a9f3
+Revises: 3477d4d7b0cf
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2e8d41a9f3'
+down_revision: Union[str, None] = '3477d4d7b0cf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_emission_totals',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_emissions', sa.Float(precision=53), nullable=False),
+    sa.Column('log_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('user_activity_totals',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('activity_type', sa.String(), nullable=False),
+    sa.Column('total_value', sa.Float(precision=53), nullable=False),
+    sa.Column('total_emissions', sa.Float(precision=53), nullable=False),
+    sa.Column('log_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'activity_type')
+    )
+    # Existing logs are folded in with: python -m backend.app.emission_totals rebuild
+
+
+def downgrade() -> None:
+    op.drop_table('user_activity_totals')
+    op.drop_table('user_emission_totals')
@@ -0,0 +1,34 @@
+"""Add per-user composite indexes
+
+Revision ID: 7d3f5a9e0c14
+Revises: e4b9c27a1d06
+Create Date: 2026-10-18 12:20:51.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3f5a9e0c14'
+down_revision: Union[str, None] = 'e4b9c27a1d06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_activity_logs_user_id_date', 'activity_logs', ['user_id', 'date'], unique=False)
+    op.create_index('ix_goals_user_id_deadline', 'goals', ['user_id', 'deadline'], unique=False)
+    op.create_index('ix_reports_user_id_generated_date', 'reports', ['user_id', 'generated_date'], unique=False)
+    op.create_index('ix_achievements_user_id_date_awarded', 'achievements', ['user_id', 'date_awarded'], unique=False)
+    op.create_index('ix_tips_user_id', 'tips', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tips_user_id', table_name='tips')
+    op.drop_index('ix_achievements_user_id_date_awarded', table_name='achievements')
+    op.drop_index('ix_reports_user_id_generated_date', table_name='reports')
+    op.drop_index('ix_goals_user_id_deadline', table_name='goals')
+    op.drop_index('ix_activity_logs_user_id_date', table_name='activity_logs')
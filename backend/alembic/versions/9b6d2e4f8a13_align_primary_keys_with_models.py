@@ -0,0 +1,52 @@
+"""Align primary keys with the models
+
+The first revision created the primary keys of these tables as VARCHAR while
+the models (and create_all) use autoincrementing integers, and left
+reports.user_id nullable. Now that the app no longer runs create_all at
+startup, a database built with ``alembic upgrade head`` has to match the
+models. Columns that are already integers are left alone.
+
+Revision ID: 9b6d2e4f8a13
+Revises: 3c8e1f7a2d95
+Create Date: 2026-10-18 16:41:09.203118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b6d2e4f8a13'
+down_revision: Union[str, None] = '3c8e1f7a2d95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PRIMARY_KEYS = (
+    ('achievements', 'achievement_id'),
+    ('activity_logs', 'log_id'),
+    ('emission_factors', 'factor_id'),
+    ('goals', 'goal_id'),
+    ('reports', 'report_id'),
+    ('tips', 'tip_id'),
+)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table, column in PRIMARY_KEYS:
+        current = next(c for c in inspector.get_columns(table) if c['name'] == column)
+        if not isinstance(current['type'], sa.String):
+            continue
+        sequence = f'{table}_{column}_seq'
+        op.alter_column(table, column, type_=sa.Integer(), postgresql_using=f'{column}::integer')
+        op.execute(f'CREATE SEQUENCE IF NOT EXISTS {sequence} OWNED BY {table}.{column}')
+        op.execute(f"SELECT setval('{sequence}', COALESCE((SELECT MAX({column}) FROM {table}), 0) + 1, false)")
+        op.alter_column(table, column, server_default=sa.text(f"nextval('{sequence}'::regclass)"))
+    op.alter_column('reports', 'user_id', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade() -> None:
+    # Turning integer keys back into VARCHAR would only reintroduce the drift
+    op.alter_column('reports', 'user_id', existing_type=sa.Integer(), nullable=True)
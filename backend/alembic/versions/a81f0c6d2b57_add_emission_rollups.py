@@ -0,0 +1,37 @@
+"""Add daily, weekly and monthly emission rollups
+
+Revision ID: a81f0c6d2b57
+Revises: 5c2e8d41a9f3
+Create Date: 2026-10-18 10:03:17.552961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a81f0c6d2b57'
+down_revision: Union[str, None] = '5c2e8d41a9f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('emission_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('granularity', sa.String(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('activity_type', sa.String(), nullable=False),
+    sa.Column('total_value', sa.Float(precision=53), nullable=False),
+    sa.Column('total_emissions', sa.Float(precision=53), nullable=False),
+    sa.Column('log_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'granularity', 'bucket_start', 'activity_type')
+    )
+    # Existing logs are folded in with: python -m backend.app.emission_totals rebuild
+
+
+def downgrade() -> None:
+    op.drop_table('emission_rollups')
@@ -0,0 +1,47 @@
+"""Add compacted_activity_logs and activity_log_archive
+
+Revision ID: b5e1d9c74f20
+Revises: f2a7c5d31e88
+Create Date: 2026-10-18 18:05:14.662091
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e1d9c74f20'
+down_revision: Union[str, None] = 'f2a7c5d31e88'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('compacted_activity_logs',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('activity_type', sa.String(), nullable=False),
+    sa.Column('day', sa.DateTime(), nullable=False),
+    sa.Column('total_value', sa.Float(precision=53), nullable=False),
+    sa.Column('total_emissions', sa.Float(precision=53), nullable=False),
+    sa.Column('log_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'activity_type', 'day')
+    )
+    op.create_table('activity_log_archive',
+    sa.Column('log_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('activity_type', sa.String(), nullable=False),
+    sa.Column('activity_value', sa.Float(precision=53), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('log_id')
+    )
+    op.create_index('ix_activity_log_archive_user_id_date', 'activity_log_archive', ['user_id', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_activity_log_archive_user_id_date', table_name='activity_log_archive')
+    op.drop_table('activity_log_archive')
+    op.drop_table('compacted_activity_logs')
@@ -0,0 +1,58 @@
+"""Cascade user deletes to the rows that reference users
+
+Every foreign key to users.user_id is recreated with ON DELETE CASCADE, so
+deleting a user is one statement on users and Postgres removes the dependent
+rows itself instead of the application loading or deleting them first. The
+existing constraints are looked up by table because their names differ
+between databases (activity_logs got a suffixed name when it was
+partitioned); they are recreated as ``<table>_user_id_fkey``.
+
+Revision ID: c7a4e2f19d36
+Revises: b5e1d9c74f20
+Create Date: 2026-10-18 19:12:40.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7a4e2f19d36'
+down_revision: Union[str, None] = 'b5e1d9c74f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = (
+    'achievements',
+    'activity_logs',
+    'goals',
+    'reports',
+    'tips',
+    'user_emission_totals',
+    'user_activity_totals',
+    'emission_rollups',
+    'compacted_activity_logs',
+)
+
+
+def _recreate_user_fkeys(ondelete) -> None:
+    bind = op.get_bind()
+    for table in TABLES:
+        # Partitions carry copies of the parent's constraint (conparentid <> 0) that go with it
+        names = bind.execute(sa.text(
+            "SELECT conname FROM pg_constraint WHERE contype = 'f' AND conparentid = 0 "
+            "AND conrelid = to_regclass(:table) AND confrelid = 'users'::regclass"
+        ), {'table': table}).scalars().all()
+        for name in names:
+            op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(f'{table}_user_id_fkey', table, 'users', ['user_id'], ['user_id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    _recreate_user_fkeys('CASCADE')
+
+
+def downgrade() -> None:
+    _recreate_user_fkeys(None)
@@ -0,0 +1,31 @@
+"""Add validity period to emission factors
+
+Revision ID: e4b9c27a1d06
+Revises: a81f0c6d2b57
+Create Date: 2026-10-18 11:42:08.318540
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b9c27a1d06'
+down_revision: Union[str, None] = 'a81f0c6d2b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows keep NULL bounds and so stay in effect for all dates
+    op.add_column('emission_factors', sa.Column('valid_from', sa.DateTime(), nullable=True))
+    op.add_column('emission_factors', sa.Column('valid_to', sa.DateTime(), nullable=True))
+    op.create_index('ix_emission_factors_activity_type_valid_from', 'emission_factors', ['activity_type', 'valid_from'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_emission_factors_activity_type_valid_from', table_name='emission_factors')
+    op.drop_column('emission_factors', 'valid_to')
+    op.drop_column('emission_factors', 'valid_from')
@@ -0,0 +1,97 @@
+"""Partition activity_logs by month on date
+
+The table is rebuilt as a declaratively range-partitioned table with one
+partition per month, from the oldest log up to three months ahead, plus a
+default partition for anything outside them. The primary key becomes
+(log_id, date) because Postgres requires unique constraints to include the
+partition key; log_id keeps its sequence and stays unique on its own, so the
+ORM mapping is unchanged. ``python -m backend.app.partitions ensure`` keeps
+future months created.
+
+Revision ID: f2a7c5d31e88
+Revises: 9b6d2e4f8a13
+Create Date: 2026-10-18 17:26:52.880417
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c5d31e88'
+down_revision: Union[str, None] = '9b6d2e4f8a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+COLUMNS = 'log_id, user_id, activity_type, activity_value, date'
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.rename_table('activity_logs', 'activity_logs_unpartitioned')
+    op.execute('ALTER TABLE activity_logs_unpartitioned RENAME CONSTRAINT activity_logs_pkey TO activity_logs_unpartitioned_pkey')
+    op.drop_index('ix_activity_logs_user_id_date', table_name='activity_logs_unpartitioned')
+    # The sequence would be dropped along with its old owner
+    op.execute('ALTER SEQUENCE activity_logs_log_id_seq OWNED BY NONE')
+
+    op.execute(
+        "CREATE TABLE activity_logs ("
+        "log_id INTEGER NOT NULL DEFAULT nextval('activity_logs_log_id_seq'::regclass), "
+        "user_id INTEGER REFERENCES users (user_id), "
+        "activity_type VARCHAR NOT NULL, "
+        "activity_value DOUBLE PRECISION NOT NULL, "
+        "date TIMESTAMP WITHOUT TIME ZONE NOT NULL, "
+        "CONSTRAINT activity_logs_pkey PRIMARY KEY (log_id, date)"
+        ") PARTITION BY RANGE (date)"
+    )
+    op.execute('ALTER SEQUENCE activity_logs_log_id_seq OWNED BY activity_logs.log_id')
+    op.create_index('ix_activity_logs_user_id_date', 'activity_logs', ['user_id', 'date'], unique=False)
+    op.execute('CREATE TABLE activity_logs_default PARTITION OF activity_logs DEFAULT')
+
+    oldest = op.get_bind().execute(sa.text('SELECT MIN(date) FROM activity_logs_unpartitioned')).scalar()
+    now = datetime.utcnow()
+    month = datetime((oldest or now).year, (oldest or now).month, 1)
+    last = _add_months(datetime(now.year, now.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        following = _add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE activity_logs_y{month:%Y}m{month:%m} PARTITION OF activity_logs "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{following:%Y-%m-%d}')"
+        )
+        month = following
+
+    op.execute(f'INSERT INTO activity_logs ({COLUMNS}) SELECT {COLUMNS} FROM activity_logs_unpartitioned')
+    op.drop_table('activity_logs_unpartitioned')
+    op.execute('ANALYZE activity_logs')
+
+
+def downgrade() -> None:
+    op.rename_table('activity_logs', 'activity_logs_partitioned')
+    op.execute('ALTER TABLE activity_logs_partitioned RENAME CONSTRAINT activity_logs_pkey TO activity_logs_partitioned_pkey')
+    op.drop_index('ix_activity_logs_user_id_date', table_name='activity_logs_partitioned')
+    op.execute('ALTER SEQUENCE activity_logs_log_id_seq OWNED BY NONE')
+
+    op.create_table('activity_logs',
+    sa.Column('log_id', sa.Integer(), server_default=sa.text("nextval('activity_logs_log_id_seq'::regclass)"), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('activity_type', sa.String(), nullable=False),
+    sa.Column('activity_value', sa.Float(precision=53), nullable=False),
+    sa.Column('date', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('log_id')
+    )
+    op.execute('ALTER SEQUENCE activity_logs_log_id_seq OWNED BY activity_logs.log_id')
+    op.create_index('ix_activity_logs_user_id_date', 'activity_logs', ['user_id', 'date'], unique=False)
+
+    # Detached partitions are not part of activity_logs_partitioned and are left as they are
+    op.execute(f'INSERT INTO activity_logs ({COLUMNS}) SELECT {COLUMNS} FROM activity_logs_partitioned')
+    op.execute('DROP TABLE activity_logs_partitioned CASCADE')
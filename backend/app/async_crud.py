@@ -0,0 +1,135 @@
+"""Async counterparts of the ``crud`` functions for routers using ``get_async_db``.
+
+Reads are issued as ``select()`` statements on the ``AsyncSession``. Writes
+that maintain the running emission totals reuse the synchronous ``crud``
+implementation through ``AsyncSession.run_sync``, so the totals logic lives
+in one place. ``run_sync`` runs the function in a greenlet on the event loop
+thread: only its database I/O is awaited, and its Python work blocks the
+loop. The per-row work of a batch (schema validation, building the totals
+rows) therefore runs in the threadpool, between ``run_sync`` calls that
+only issue the statements.
+"""
+import asyncio
+from typing import Dict, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.app.models import Achievement, ActivityLog, Goal, Report, Tip, User, UserEmissionTotal
+from backend.app.schemas import ActivityLogCreate, ActivityLogUpdate, UserCreate
+import backend.app.crud as crud
+import backend.app.emission_totals as emission_totals
+import backend.app.factor_registry as factor_registry
+
+
+async def _page(db: AsyncSession, query, key_column, skip: int, limit: int, after_id: Optional[int]):
+    if after_id is not None:
+        query = query.where(key_column > after_id)
+    query = query.order_by(key_column)
+    if skip:
+        query = query.offset(skip)
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+# -------------------------------------------USER----------------------------------------------------------
+async def get_users(db: AsyncSession, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    return await _page(db, select(User), User.user_id, skip, limit, after_id)
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.get(User, user_id)
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).where(User.email == email))
+    return result.scalars().first()
+
+async def create_user(db: AsyncSession, user: UserCreate):
+    return await db.run_sync(crud.create_user, user)
+
+async def update_user_password(db: AsyncSession, user_id: int, password: str):
+    return await db.run_sync(crud.update_user_password, user_id, password)
+
+async def get_user_emissions(db: AsyncSession, user_id: int):
+    result = await db.execute(select(UserEmissionTotal.total_emissions).where(UserEmissionTotal.user_id == user_id))
+    return float(result.scalar() or 0.0)
+
+# ------------------------------------------- DASHBOARD ----------------------------------------------------------
+# Section name -> (model, date column, primary key); newest rows first
+DASHBOARD_SECTIONS = {
+    "activities": (ActivityLog, ActivityLog.date, ActivityLog.log_id),
+    "reports": (Report, Report.generated_date, Report.report_id),
+    "goals": (Goal, Goal.deadline, Goal.goal_id),
+    "tips": (Tip, None, Tip.tip_id),
+    "achievements": (Achievement, Achievement.date_awarded, Achievement.achievement_id),
+}
+
+def _latest(section: str, user_id: int, limit: int):
+    model, date_column, key_column = DASHBOARD_SECTIONS[section]
+    order = (key_column.desc(),) if date_column is None else (date_column.desc(), key_column.desc())
+    return select(model).where(model.user_id == user_id).order_by(*order).limit(limit)
+
+async def _first(db: AsyncSession, query):
+    return (await db.execute(query)).first()
+
+async def _all(db: AsyncSession, query):
+    return (await db.execute(query)).scalars().all()
+
+async def get_user_dashboard(db: AsyncSession, user_id: int, limits: Dict[str, int], parallel: bool = False):
+    """The user's emissions total and newest rows of each section in ``limits``, or ``None`` for an unknown user.
+
+    Reads one statement for the user and their total plus one per section. By
+    default they run back to back on ``db``; with ``parallel`` each runs on its
+    own connection from the same engine, which trades pool capacity for latency.
+    """
+    head = select(User.user_id, UserEmissionTotal.total_emissions).outerjoin(
+        UserEmissionTotal, UserEmissionTotal.user_id == User.user_id
+    ).where(User.user_id == user_id)
+    sections = [(section, _latest(section, user_id, limit)) for section, limit in limits.items()]
+
+    if parallel:
+        async def run(fetch, query):
+            async with AsyncSession(db.bind, expire_on_commit=False) as session:
+                return await fetch(session, query)
+        user, *rows = await asyncio.gather(run(_first, head), *(run(_all, query) for _, query in sections))
+    else:
+        user = await _first(db, head)
+        rows = [await _all(db, query) for _, query in sections] if user is not None else []
+
+    if user is None:
+        return None
+    dashboard = {"user_id": user.user_id, "total_emissions": float(user.total_emissions or 0.0)}
+    dashboard.update((section, section_rows) for (section, _), section_rows in zip(sections, rows))
+    return dashboard
+
+# ------------------------------------------- ACTIVITY LOG ----------------------------------------------------------
+async def get_activity_logs(db: AsyncSession, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    return await _page(db, select(ActivityLog), ActivityLog.log_id, skip, limit, after_id)
+
+async def get_activity_log(db: AsyncSession, log_id: int):
+    return await db.get(ActivityLog, log_id)
+
+async def create_activity_log(db: AsyncSession, activity_log: ActivityLogCreate):
+    return await db.run_sync(crud.create_activity_log, activity_log)
+
+async def validate_activity_log_batch(db: AsyncSession, items, start_index: int = 0):
+    valid, errors = await run_in_threadpool(crud.parse_activity_log_batch, items, start_index)
+    return await db.run_sync(crud.check_activity_log_users, valid, errors)
+
+async def bulk_create_activity_logs(db: AsyncSession, activity_logs, chunk_size: int = crud.ACTIVITY_LOG_CHUNK_SIZE):
+    """``crud.bulk_create_activity_logs`` with the per-row work off the event loop."""
+    try:
+        rows = await run_in_threadpool(lambda: [log.model_dump() for log in activity_logs])
+        log_ids = await db.run_sync(crud.insert_activity_logs, rows, chunk_size)
+        # Factors are read after the inserts, as in the sync version
+        snapshot = await db.run_sync(factor_registry.get_snapshot)
+        total_rows = await run_in_threadpool(crud.activity_log_total_rows, activity_logs, snapshot)
+        await db.run_sync(emission_totals.apply_delta_rows, total_rows)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise Exception(f"Error creating activity logs: {str(e)}")
+    return log_ids
+
+async def update_activity_log(db: AsyncSession, log_id: int, activity_log: ActivityLogUpdate):
+    return await db.run_sync(crud.update_activity_log, log_id, activity_log)
+
+async def delete_activity_log(db: AsyncSession, log_id: int):
+    return await db.run_sync(crud.delete_activity_log, log_id)
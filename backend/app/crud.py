@@ -1,13 +1,71 @@
-from backend.app.models import User, Achievement, ActivityLog, Goal, EmissionFactor, Report as DBReport, Tip
+from backend.app.models import User, Achievement, ActivityLog, CompactedActivityLog, Goal, EmissionFactor, Report as DBReport, Tip, UserActivityTotal, UserEmissionTotal
 from backend.app.schemas import TipCreate, ReportCreate, AchievementCreate, UserCreate, ActivityLogCreate, ActivityLogUpdate, GoalCreate, GoalUpdate, EmissionFactorCreate
+from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.orm import Session
+from pydantic import ValidationError
 from datetime import datetime, timezone
-from backend.app.routers.auth import pwd_context
+from typing import Optional
+import backend.app.emission_totals as emission_totals
+import backend.app.factor_registry as factor_registry
+import backend.app.etags as etags
+
+# Rows per multi-row INSERT statement used by the bulk activity log path
+ACTIVITY_LOG_CHUNK_SIZE = 1000
+
+# Rows per INSERT ... ON CONFLICT statement used by the bulk user upsert
+USER_CHUNK_SIZE = 1000
+
+def _page(query, key_column, skip: int, limit: int, after_id: Optional[int]):
+    """One page in primary key order; ``after_id`` continues after a keyset cursor instead of scanning ``skip`` rows."""
+    if after_id is not None:
+        query = query.filter(key_column > after_id)
+    query = query.order_by(key_column)
+    if skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def _naive_utc(date):
+    # Date columns are timestamps without time zone holding UTC
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+def _returning(db: Session, model, stmt, *columns):
+    """Run one INSERT/UPDATE/DELETE ``stmt`` with RETURNING and load the row as a ``model`` instance.
+
+    ``None`` means no row was affected. The instance is expunged so reading it
+    after the commit needs no refresh SELECT; extra ``columns`` are returned
+    alongside it as ``(instance, *values)``.
+    """
+    row = db.execute(
+        select(model, *columns).from_statement(stmt.returning(*model.__table__.columns, *columns))
+        .execution_options(populate_existing=True)
+    ).first()
+    if row is None:
+        return None
+    db.expunge(row[0])
+    return row if columns else row[0]
+
+def _user_page(db: Session, model, date_column, key_column, user_id: int, start=None, end=None, limit: int = 100, after=None):
+    """One user's rows between ``start`` and ``end`` (inclusive) in ``(date, pk)`` order.
+
+    Served by the ``(user_id, <date>)`` indexes; ``after`` is a ``(date, pk)``
+    keyset cursor.
+    """
+    query = db.query(model).filter(model.user_id == user_id)
+    if start is not None:
+        query = query.filter(date_column >= _naive_utc(start))
+    if end is not None:
+        query = query.filter(date_column <= _naive_utc(end))
+    if after is not None:
+        query = query.filter(tuple_(date_column, key_column) > tuple_(*after))
+    return query.order_by(date_column, key_column).limit(limit).all()
 
 # -------------------------------------------USER----------------------------------------------------------
-def get_users(db: Session, skip: int = 0, limit: int = 10):
+def get_users(db: Session, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
     try:
-        users = db.query(User).offset(skip).limit(limit).all()
+        users = _page(db.query(User), User.user_id, skip, limit, after_id)
         return users
     except Exception as e:
         raise Exception(f"Error retrieving users: {str(e)}")
@@ -25,10 +83,8 @@ def get_users(db: Session, skip: int = 0, limit: int = 10):
 
 def create_user(db: Session, user: UserCreate):
     try:
-        db_user = User(username=user.username, email=user.email, password=user.password, profile_info=user.profile_info)
-        db.add(db_user)
+        db_user = _returning(db, User, insert(User).values(username=user.username, email=user.email, password=user.password, profile_info=user.profile_info))
         db.commit()
-        db.refresh(db_user)
         return db_user  # Returning the ORM model
     except Exception as e:
         db.rollback()
@@ -43,315 +99,458 @@ def get_user(db: Session, user_id: int):
 
 def update_user(db: Session, user_id: int, user: UserCreate):
     try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        if db_user:
-            db_user.username = user.username
-            db_user.email = user.email
-            db_user.password = user.password
-            db_user.profile_info = user.profile_info
-            db.commit()
-            db.refresh(db_user)
-        else:
-            raise Exception("User not found")
+        db_user = _returning(db, User, update(User).where(User.user_id == user_id).values(
+            username=user.username, email=user.email, password=user.password, profile_info=user.profile_info
+        ))
+        db.commit()
         return db_user
     except Exception as e:
         db.rollback()
         raise Exception(f"Error updating user: {str(e)}")
 
-def update_user(db: Session, user_id: int, user: UserCreate):
+def delete_user(db: Session, user_id: int):
     try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        if db_user:
-            db_user.username = user.username
-            db_user.email = user.email
-            db_user.password = user.password
-            db_user.profile_info = user.profile_info
-            db.commit()
-            db.refresh(db_user)
-        else:
-            raise Exception("User not found")
+        # Rows referencing the user go with it through ON DELETE CASCADE; purge.purge_user
+        # deletes a large history in bounded chunks first
+        db_user = _returning(db, User, delete(User).where(User.user_id == user_id))
+        if db_user is None:
+            db.rollback()
+            return None
+        etags.bump(db, etags.TIPS, etags.user_emissions(user_id))
+        db.commit()
         return db_user
     except Exception as e:
         db.rollback()
-        raise Exception(f"Error updating user: {str(e)}")
+        raise Exception(f"Error deleting user: {str(e)}")
 
-def delete_user(db: Session, user_id: int):
+def bulk_upsert_users(db: Session, users, chunk_size: int = USER_CHUNK_SIZE):
+    """Create or update users keyed on email with multi-row ``INSERT ... ON CONFLICT (email) DO UPDATE`` in one transaction.
+
+    Returns the stored users in input order; when an email repeats, its last
+    entry wins.
+    """
+    by_email = {user.email: user for user in users}
+    rows = [
+        {"username": user.username, "email": user.email, "password": user.password, "profile_info": user.profile_info}
+        for user in by_email.values()
+    ]
+    stored = {}
     try:
-        db_user = db.query(User).filter(User.user_id == user_id).first()
-        if db_user:
-            db.delete(db_user)
-            db.commit()
-        else:
-            raise Exception("User not found")
-        return db_user
+        for start in range(0, len(rows), chunk_size):
+            stmt = postgresql.insert(User).values(rows[start:start + chunk_size])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[User.email],
+                set_={column: getattr(stmt.excluded, column) for column in ("username", "password", "profile_info")}
+            )
+            result = db.execute(
+                select(User).from_statement(stmt.returning(*User.__table__.columns)).execution_options(populate_existing=True)
+            ).scalars().all()
+            for db_user in result:
+                db.expunge(db_user)
+                stored[db_user.email] = db_user
+        db.commit()
     except Exception as e:
         db.rollback()
-        raise Exception(f"Error deleting user: {str(e)}")
+        raise Exception(f"Error upserting users: {str(e)}")
+    return [stored[email] for email in by_email]
+
+def bulk_delete_users(db: Session, user_ids):
+    """Delete ``user_ids`` with one set-based DELETE; their rows go with them through ON DELETE CASCADE.
+
+    Returns the ids that existed and were deleted, in ascending order.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return []
+    try:
+        deleted = db.execute(delete(User).where(User.user_id.in_(user_ids)).returning(User.user_id)).scalars().all()
+        if deleted:
+            etags.bump(db, etags.TIPS, *(etags.user_emissions(user_id) for user_id in deleted))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Error deleting users: {str(e)}")
+    return sorted(deleted)
 
 # Function added for authentication
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
+def update_user_password(db: Session, user_id: int, password: str):
+    try:
+        db_user = _returning(db, User, update(User).where(User.user_id == user_id).values(password=password))
+        db.commit()
+        return db_user
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Error updating password: {str(e)}")
+
+def get_existing_user_ids(db: Session, user_ids):
+    if not user_ids:
+        return set()
+    rows = db.query(User.user_id).filter(User.user_id.in_(user_ids)).all()
+    return {row.user_id for row in rows}
+
 # ------------------------------------------- ACTIVITY LOG ----------------------------------------------------------
 def create_activity_log(db: Session, activity_log: ActivityLogCreate):
-    db_activity_log = ActivityLog(
+    db_activity_log = _returning(db, ActivityLog, insert(ActivityLog).values(
         user_id=activity_log.user_id,
         activity_type=activity_log.activity_type,
         activity_value=activity_log.activity_value,
         date=activity_log.date
-    )
-    db.add(db_activity_log)
+    ))
+    deltas = emission_totals.new_deltas()
+    emission_totals.log_delta(deltas, activity_log.user_id, activity_log.activity_type, activity_log.activity_value, activity_log.date, factor_registry.get_snapshot(db))
+    emission_totals.apply_deltas(db, deltas)
     db.commit()
-    db.refresh(db_activity_log)
     return db_activity_log
 
-def get_activity_logs(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(ActivityLog).offset(skip).limit(limit).all()
+def parse_activity_log_batch(items, start_index: int = 0):
+    """Validate raw activity log payloads against the schema, without touching the database.
+
+    Returns ``(valid, errors)`` as :func:`validate_activity_log_batch` does,
+    before unknown users are looked for.
+    """
+    valid = []
+    errors = []
+    for index, item in enumerate(items, start=start_index):
+        try:
+            valid.append((index, ActivityLogCreate.model_validate(item)))
+        except ValidationError as e:
+            errors.append({"index": index, "detail": e.errors(include_url=False, include_context=False, include_input=False)})
+    return valid, errors
+
+def check_activity_log_users(db: Session, valid, errors):
+    """Move the logs of unknown users from ``valid`` to ``errors`` with one query for the whole batch."""
+    known_user_ids = get_existing_user_ids(db, {log.user_id for _, log in valid})
+    checked = []
+    errors = list(errors)
+    for index, log in valid:
+        if log.user_id in known_user_ids:
+            checked.append((index, log))
+        else:
+            errors.append({"index": index, "detail": f"User {log.user_id} not found"})
+    errors.sort(key=lambda error: error["index"])
+    return checked, errors
+
+def validate_activity_log_batch(db: Session, items, start_index: int = 0):
+    """Validate raw activity log payloads in a single pass.
+
+    Returns ``(valid, errors)`` where ``valid`` holds ``(index, ActivityLogCreate)``
+    pairs and ``errors`` holds ``{"index", "detail"}`` dicts. Unknown users are
+    resolved with one query for the whole batch instead of one per row.
+    """
+    return check_activity_log_users(db, *parse_activity_log_batch(items, start_index))
+
+def insert_activity_logs(db: Session, rows, chunk_size: int = ACTIVITY_LOG_CHUNK_SIZE):
+    """Insert activity log ``rows`` (dicts) with multi-row INSERTs without committing; returns their ``log_id`` values."""
+    log_ids = []
+    for start in range(0, len(rows), chunk_size):
+        result = db.execute(insert(ActivityLog).values(rows[start:start + chunk_size]).returning(ActivityLog.log_id))
+        log_ids.extend(row.log_id for row in result)
+    return log_ids
+
+def activity_log_total_rows(activity_logs, snapshot):
+    """The running total and rollup rows ``activity_logs`` add with the factors in ``snapshot``; no database access."""
+    deltas = emission_totals.new_deltas()
+    for log in activity_logs:
+        emission_totals.log_delta(deltas, log.user_id, log.activity_type, log.activity_value, log.date, snapshot)
+    return emission_totals.delta_rows(deltas)
+
+def bulk_create_activity_logs(db: Session, activity_logs, chunk_size: int = ACTIVITY_LOG_CHUNK_SIZE):
+    """Insert activity logs with multi-row INSERTs in a single transaction.
+
+    Returns the new ``log_id`` values in input order.
+    """
+    try:
+        log_ids = insert_activity_logs(db, [log.model_dump() for log in activity_logs], chunk_size)
+        # Factors are read after the inserts, which wait for a factor recompute holding these users
+        rows = activity_log_total_rows(activity_logs, factor_registry.get_snapshot(db))
+        emission_totals.apply_delta_rows(db, rows)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise Exception(f"Error creating activity logs: {str(e)}")
+    return log_ids
+
+def get_activity_logs(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    return _page(db.query(ActivityLog), ActivityLog.log_id, skip, limit, after_id)
+
+def get_user_activity_logs(db: Session, user_id: int, start=None, end=None, limit: int = 100, after=None):
+    return _user_page(db, ActivityLog, ActivityLog.date, ActivityLog.log_id, user_id, start, end, limit, after)
 
 def get_activity_log(db: Session, log_id: int):
     return db.query(ActivityLog).filter(ActivityLog.log_id == log_id).first()
 
 def update_activity_log(db: Session, log_id: int, activity_log: ActivityLogUpdate):
-    db_activity_log = db.query(ActivityLog).filter(ActivityLog.log_id == log_id).first()
-    if db_activity_log:
-        for key, value in activity_log.model_dump(exclude_unset=True).items():
-            setattr(db_activity_log, key, value)
-        db.commit()
-        db.refresh(db_activity_log)
+    # The locked pre-update row comes back from the same statement, for the totals' negative delta
+    table = ActivityLog.__table__
+    old = select(table).where(table.c.log_id == log_id).with_for_update().cte("old")
+    result = _returning(
+        db, ActivityLog,
+        update(ActivityLog).where(ActivityLog.log_id == old.c.log_id).values(**activity_log.model_dump(exclude_unset=True)),
+        old.c.user_id.label("old_user_id"), old.c.activity_type.label("old_activity_type"),
+        old.c.activity_value.label("old_activity_value"), old.c.date.label("old_date")
+    )
+    if result is None:
+        return None
+    db_activity_log = result[0]
+    snapshot = factor_registry.get_snapshot(db)
+    deltas = emission_totals.new_deltas()
+    emission_totals.log_delta(deltas, result.old_user_id, result.old_activity_type, result.old_activity_value, result.old_date, snapshot, sign=-1)
+    emission_totals.log_delta(deltas, db_activity_log.user_id, db_activity_log.activity_type, db_activity_log.activity_value, db_activity_log.date, snapshot)
+    emission_totals.apply_deltas(db, deltas)
+    db.commit()
     return db_activity_log
 
 def delete_activity_log(db: Session, log_id: int):
-    db_activity_log = db.query(ActivityLog).filter(ActivityLog.log_id == log_id).first()
+    db_activity_log = _returning(db, ActivityLog, delete(ActivityLog).where(ActivityLog.log_id == log_id))
     if db_activity_log:
-        db.delete(db_activity_log)
+        deltas = emission_totals.new_deltas()
+        emission_totals.log_delta(deltas, db_activity_log.user_id, db_activity_log.activity_type, db_activity_log.activity_value, db_activity_log.date, factor_registry.get_snapshot(db), sign=-1)
+        emission_totals.apply_deltas(db, deltas)
         db.commit()
     return db_activity_log
 # ------------------------------------------- EMISSION FACTOR ----------------------------------------------------------
 def create_emission_factor(db: Session, emission_factor: EmissionFactorCreate):
-    db_emission_factor = EmissionFactor(**emission_factor.model_dump())
-    db.add(db_emission_factor)
+    db_emission_factor = _returning(db, EmissionFactor, insert(EmissionFactor).values(**emission_factor.model_dump()))
+    etags.bump(db, etags.EMISSION_FACTORS)
     db.commit()
-    db.refresh(db_emission_factor)
+    factor_registry.refresh(db)
     return db_emission_factor
 
 def get_emission_factor(db: Session, factor_id: int):
     return db.query(EmissionFactor).filter(EmissionFactor.factor_id == factor_id).first()
 
-def get_emission_factors(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(EmissionFactor).offset(skip).limit(limit).all()
+def get_emission_factors(db: Session, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    return _page(db.query(EmissionFactor), EmissionFactor.factor_id, skip, limit, after_id)
 
 def delete_emission_factor(db: Session, factor_id: int):
-    db_emission_factor = db.query(EmissionFactor).filter(EmissionFactor.factor_id == factor_id).first()
+    db_emission_factor = _returning(db, EmissionFactor, delete(EmissionFactor).where(EmissionFactor.factor_id == factor_id))
     if db_emission_factor:
-        db.delete(db_emission_factor)
+        etags.bump(db, etags.EMISSION_FACTORS)
         db.commit()
+        factor_registry.refresh(db)
     return db_emission_factor
 # ------------------------------------------- GOAL ----------------------------------------------------------
 def create_goal(db: Session, goal: GoalCreate):
-    db_goal = Goal(
+    db_goal = _returning(db, Goal, insert(Goal).values(
         user_id=goal.user_id,
         target_reduction=goal.target_reduction,
         deadline=goal.deadline,
         achieved=goal.achieved
-    )
-    db.add(db_goal)
+    ))
     db.commit()
-    db.refresh(db_goal)
     return db_goal
 
 
-def get_goals(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(Goal).offset(skip).limit(limit).all()
+def get_goals(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    return _page(db.query(Goal), Goal.goal_id, skip, limit, after_id)
 
 
+def get_user_goals(db: Session, user_id: int, start=None, end=None, limit: int = 100, after=None):
+    return _user_page(db, Goal, Goal.deadline, Goal.goal_id, user_id, start, end, limit, after)
+
 def get_goal(db: Session, goal_id: int):
     return db.query(Goal).filter(Goal.goal_id == goal_id).first()
 
 
 def update_goal(db: Session, goal_id: int, goal: GoalUpdate):
-    db_goal = db.query(Goal).filter(Goal.goal_id == goal_id).first()
-    if db_goal:
-        for key, value in goal.model_dump(exclude_unset=True).items():
-            setattr(db_goal, key, value)
-        db.commit()
-        db.refresh(db_goal)
+    db_goal = _returning(db, Goal, update(Goal).where(Goal.goal_id == goal_id).values(**goal.model_dump(exclude_unset=True)))
+    db.commit()
     return db_goal
 
 
 def delete_goal(db: Session, goal_id: int):
-    db_goal = db.query(Goal).filter(Goal.goal_id == goal_id).first()
-    if db_goal:
-        db.delete(db_goal)
-        db.commit()
+    db_goal = _returning(db, Goal, delete(Goal).where(Goal.goal_id == goal_id))
+    db.commit()
     return db_goal
 
 # ------------------------------------------- ACHIEVEMENT ----------------------------------------------------
-def get_achievements(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(Achievement).offset(skip).limit(limit).all()
+def get_achievements(db: Session, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    return _page(db.query(Achievement), Achievement.achievement_id, skip, limit, after_id)
+
+def get_user_achievements(db: Session, user_id: int, start=None, end=None, limit: int = 100, after=None):
+    return _user_page(db, Achievement, Achievement.date_awarded, Achievement.achievement_id, user_id, start, end, limit, after)
 
 def create_achievement(db: Session, achievement: AchievementCreate):
-    db_achievement = Achievement(
+    db_achievement = _returning(db, Achievement, insert(Achievement).values(
         user_id=achievement.user_id,
         achievement_type=achievement.achievement_type,
         date_awarded=achievement.date_awarded
-    )
-    db.add(db_achievement)
+    ))
     db.commit()
-    db.refresh(db_achievement)
     return db_achievement
 
 def get_achievement(db: Session, achievement_id: int):
     return db.query(Achievement).filter(Achievement.achievement_id == achievement_id).first()
 
 def update_achievement(db: Session, achievement_id: int, achievement: AchievementCreate):
-    db_achievement = db.query(Achievement).filter(Achievement.achievement_id == achievement_id).first()
-    if db_achievement:
-        db_achievement.user_id = achievement.user_id
-        db_achievement.achievement_type = achievement.achievement_type
-        db_achievement.date_awarded = achievement.date_awarded
-        db.commit()
-        db.refresh(db_achievement)
+    db_achievement = _returning(db, Achievement, update(Achievement).where(Achievement.achievement_id == achievement_id).values(
+        user_id=achievement.user_id,
+        achievement_type=achievement.achievement_type,
+        date_awarded=achievement.date_awarded
+    ))
+    db.commit()
     return db_achievement
 
 def delete_achievement(db: Session, achievement_id: int):
-    db_achievement = db.query(Achievement).filter(Achievement.achievement_id == achievement_id).first()
-    if db_achievement:
-        db.delete(db_achievement)
-        db.commit()
+    db_achievement = _returning(db, Achievement, delete(Achievement).where(Achievement.achievement_id == achievement_id))
+    db.commit()
     return db_achievement
 
 # ------------------------------------------- REPORT ---------------------------------------------------------
 def get_report(db: Session, report_id: int):
     return db.query(DBReport).filter(DBReport.report_id == report_id).first()
 
-def get_reports(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(DBReport).offset(skip).limit(limit).all()
+def get_reports(db: Session, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    return _page(db.query(DBReport), DBReport.report_id, skip, limit, after_id)
+
 
+def get_user_reports(db: Session, user_id: int, start=None, end=None, limit: int = 100, after=None):
+    return _user_page(db, DBReport, DBReport.generated_date, DBReport.report_id, user_id, start, end, limit, after)
 
 def create_report(db: Session, report: ReportCreate):
-    db_report = DBReport(
+    db_report = _returning(db, DBReport, insert(DBReport).values(
         user_id=report.user_id,
         report_data=report.report_data,
         generated_date=report.generated_date
-    )
-    db.add(db_report)
+    ))
     db.commit()
-    db.refresh(db_report)
     return db_report
 
 
 def update_report(db: Session, report_id: int, report: ReportCreate):
-    db_report = db.query(DBReport).filter(DBReport.report_id == report_id).first()
-    if db_report:
-        db_report.user_id = report.user_id
-        db_report.report_data = report.report_data
-        db_report.generated_date = report.generated_date
-        db.commit()
-        db.refresh(db_report)
+    db_report = _returning(db, DBReport, update(DBReport).where(DBReport.report_id == report_id).values(
+        user_id=report.user_id,
+        report_data=report.report_data,
+        generated_date=report.generated_date
+    ))
+    db.commit()
     return db_report
 
 
 def delete_report(db: Session, report_id: int):
-    db_report = db.query(DBReport).filter(DBReport.report_id == report_id).first()
-    if db_report:
-        db.delete(db_report)
-        db.commit()
+    db_report = _returning(db, DBReport, delete(DBReport).where(DBReport.report_id == report_id))
+    db.commit()
     return db_report
 
 # ------------------------------------------- TIP ----------------------------------------------------------
 def get_tip(db: Session, tip_id: int):
     return db.query(Tip).filter(Tip.tip_id == tip_id).first()
 
-def get_tips(db: Session, skip: int = 0, limit: int = 10):
-    return db.query(Tip).offset(skip).limit(limit).all()
+def get_tips(db: Session, skip: int = 0, limit: int = 10, after_id: Optional[int] = None):
+    return _page(db.query(Tip), Tip.tip_id, skip, limit, after_id)
+
+def get_user_tips(db: Session, user_id: int, limit: int = 100, after_id: Optional[int] = None):
+    # Tips have no date; one user's are read through the user_id index in primary key order
+    return _page(db.query(Tip).filter(Tip.user_id == user_id), Tip.tip_id, 0, limit, after_id)
 
 def create_tip(db: Session, tip: TipCreate):
-    db_tip = Tip(
+    db_tip = _returning(db, Tip, insert(Tip).values(
         tip_text=tip.tip_text,
         category=tip.category,
         user_id=tip.user_id
-    )
-    db.add(db_tip)
+    ))
+    etags.bump(db, etags.TIPS)
     db.commit()
-    db.refresh(db_tip)
     return db_tip
 
 def update_tip(db: Session, tip_id: int, tip: TipCreate):
-    db_tip = db.query(Tip).filter(Tip.tip_id == tip_id).first()
+    db_tip = _returning(db, Tip, update(Tip).where(Tip.tip_id == tip_id).values(
+        tip_text=tip.tip_text,
+        category=tip.category,
+        user_id=tip.user_id
+    ))
     if db_tip:
-        db_tip.tip_text = tip.tip_text
-        db_tip.category = tip.category
-        db_tip.user_id = tip.user_id
+        etags.bump(db, etags.TIPS)
         db.commit()
-        db.refresh(db_tip)
     return db_tip
 
 def delete_tip(db: Session, tip_id: int):
-    db_tip = db.query(Tip).filter(Tip.tip_id == tip_id).first()
+    db_tip = _returning(db, Tip, delete(Tip).where(Tip.tip_id == tip_id))
     if db_tip:
-        db.delete(db_tip)
+        etags.bump(db, etags.TIPS)
         db.commit()
     return db_tip
 
 # Business logic and service layer functions
 # ------------------- Utility Functions -------------------
 
+def get_emission_factor_map(db: Session):
+    return factor_registry.get_factors(db)
+
+def compute_user_emissions_breakdown(db: Session, user_id: int):
+    """Total emissions and per-activity-type emissions from grouped aggregates over the raw and compacted logs.
+
+    Each raw log is weighted by the factor in effect on its date.
+    """
+    factor = factor_registry.factor_expression(factor_registry.get_snapshot(db), ActivityLog.activity_type, ActivityLog.date)
+    rows = db.query(
+        ActivityLog.activity_type,
+        func.sum(ActivityLog.activity_value * factor).label("emissions")
+    ).filter(ActivityLog.user_id == user_id).group_by(ActivityLog.activity_type).all()
+    compacted = db.query(
+        CompactedActivityLog.activity_type,
+        func.sum(CompactedActivityLog.total_emissions).label("emissions")
+    ).filter(CompactedActivityLog.user_id == user_id).group_by(CompactedActivityLog.activity_type).all()
+
+    by_activity_type = {}
+    for row in rows + compacted:
+        by_activity_type[row.activity_type] = by_activity_type.get(row.activity_type, 0.0) + float(row.emissions)
+    return {"total": float(sum(by_activity_type.values())), "by_activity_type": by_activity_type}
+
+def get_user_emissions_breakdown(db: Session, user_id: int):
+    """Total and per-activity-type emissions read from the running totals."""
+    rows = db.query(UserActivityTotal.activity_type, UserActivityTotal.total_emissions).filter(
+        UserActivityTotal.user_id == user_id, UserActivityTotal.log_count > 0
+    ).all()
+    by_activity_type = {row.activity_type: row.total_emissions for row in rows}
+    return {"total": get_user_emissions(db, user_id), "by_activity_type": by_activity_type}
+
 def get_user_emissions(db: Session, user_id: int):
-    activities = db.query(ActivityLog).filter(ActivityLog.user_id == user_id).all()
-    total_emissions = 0
-    emission_factors = {
-        "car_travel": 0.21,
-        "public_transport": 0.1,
-        "electricity_usage": 0.5,
-        "natural_gas_usage":2.2,
-        "waste_generation":0.3,
-        "water_usage":  0.001,
-        "air_travel":  0.25,
-        "food_consumption_meat": 27,
-        "food_consumption_vegetables":2,
-         "clothing_purchases":14
-    }
-    
-    for activity in activities:
-        factor = emission_factors.get(activity.activity_type, 0)
-        total_emissions += activity.activity_value * factor
-    
-    return total_emissions
+    # The running total covers compacted days as well as the raw logs still kept
+    total = db.query(UserEmissionTotal.total_emissions).filter(UserEmissionTotal.user_id == user_id).scalar()
+    return float(total or 0.0)
+
+def get_user_emissions_series(db: Session, user_id: int, granularity: str, start: datetime = None, end: datetime = None):
+    return emission_totals.get_series(db, user_id, granularity, start, end)
 
 def generate_emission_report(db: Session, user_id: int):
     total_emissions = get_user_emissions(db, user_id)
     report_data = f"Total emissions for user {user_id}: {total_emissions} kg CO2e"
-    report = DBReport(
+    report = _returning(db, DBReport, insert(DBReport).values(
         user_id=user_id,
         report_data=report_data,
         generated_date=datetime.now(timezone.utc)
-    )
-    db.add(report)
+    ))
     db.commit()
-    db.refresh(report)
     return report
 
+# Per-activity tip shown when a single log's emissions exceed the benchmark
+TIP_RULES = {
+    "car_travel": {"benchmark": 100, "tip": "Consider carpooling or using public transportation to reduce emissions.", "category": "transportation"},
+    "public_transport": {"benchmark": 200, "tip": "Check if you can reduce your public transportation usage by combining trips or choosing off-peak times.", "category": "transportation"},
+    "electricity_usage": {"benchmark": 500, "tip": "Reduce electricity consumption by using energy-efficient appliances and turning off lights when not in use.", "category": "energy"},
+    "natural_gas_usage": {"benchmark": 100, "tip": "Improve home insulation to reduce natural gas usage and lower your heating bills.", "category": "energy"},
+    "waste_generation": {"benchmark": 50, "tip": "Recycle and compost to minimize waste and reduce emissions.", "category": "waste"},
+    "water_usage": {"benchmark": 10000, "tip": "Reduce water usage by fixing leaks, using water-efficient fixtures, and taking shorter showers.", "category": "water"},
+    "air_travel": {"benchmark": 1000, "tip": "Limit air travel where possible and consider alternatives like video conferencing.", "category": "travel"},
+    "food_consumption_meat": {"benchmark": 5, "tip": "Reduce meat consumption and consider plant-based alternatives to lower your carbon footprint.", "category": "food"},
+    "food_consumption_vegetables": {"benchmark": None, "tip": "Continue consuming a variety of vegetables to maintain a low-carbon diet.", "category": "food"},
+    "clothing_purchases": {"benchmark": 5, "tip": "Buy fewer, higher-quality items and consider second-hand clothing to reduce emissions.", "category": "clothing"}
+}
+
 def generate_tips(db: Session, user_id: int):
     activities = db.query(ActivityLog).filter(ActivityLog.user_id == user_id).all()
+    snapshot = factor_registry.get_snapshot(db)
     tips = []
-    emission_factors = {
-        "car_travel": {"factor": 0.21, "benchmark": 100, "tip": "Consider carpooling or using public transportation to reduce emissions.", "category": "transportation"},
-        "public_transportation": {"factor": 0.1, "benchmark": 200, "tip": "Check if you can reduce your public transportation usage by combining trips or choosing off-peak times.", "category": "transportation"},
-        "electricity_usage": {"factor": 0.475, "benchmark": 500, "tip": "Reduce electricity consumption by using energy-efficient appliances and turning off lights when not in use.", "category": "energy"},
-        "natural_gas_usage": {"factor": 2.2, "benchmark": 100, "tip": "Improve home insulation to reduce natural gas usage and lower your heating bills.", "category": "energy"},
-        "waste_generation": {"factor": 0.3, "benchmark": 50, "tip": "Recycle and compost to minimize waste and reduce emissions.", "category": "waste"},
-        "water_usage": {"factor": 0.001, "benchmark": 10000, "tip": "Reduce water usage by fixing leaks, using water-efficient fixtures, and taking shorter showers.", "category": "water"},
-        "air_travel": {"factor": 0.25, "benchmark": 1000, "tip": "Limit air travel where possible and consider alternatives like video conferencing.", "category": "travel"},
-        "food_consumption_meat": {"factor": 27, "benchmark": 5, "tip": "Reduce meat consumption and consider plant-based alternatives to lower your carbon footprint.", "category": "food"},
-        "food_consumption_vegetables": {"factor": 2, "benchmark": None, "tip": "Continue consuming a variety of vegetables to maintain a low-carbon diet.", "category": "food"},
-        "clothing_purchases": {"factor": 14, "benchmark": 5, "tip": "Buy fewer, higher-quality items and consider second-hand clothing to reduce emissions.", "category": "clothing"}
-    }
-    
+
     for activity in activities:
-        details = emission_factors.get(activity.activity_type)
-        if details and activity.activity_value * details['factor'] > details['benchmark']:
+        details = TIP_RULES.get(activity.activity_type)
+        if details and details['benchmark'] is not None and activity.activity_value * snapshot.factor_at(activity.activity_type, activity.date) > details['benchmark']:
             tips.append({"tip_text": details['tip'], "category": details['category']})
-    
+
     return tips
 
 def save_tips(db: Session, user_id: int, tips):
@@ -362,6 +561,8 @@ def save_tips(db: Session, user_id: int, tips):
             user_id=user_id
         )
         db.add(tip)
+    if tips:
+        etags.bump(db, etags.TIPS)
     db.commit()
 
 
@@ -376,14 +577,13 @@ def provide_tips_to_user(db: Session, user_id: int):
 
 
 def check_goal_achievement(db: Session, user_id: int):
-    goals = db.query(Goal).filter(Goal.user_id == user_id).all()
     total_emissions = get_user_emissions(db, user_id)
-    achieved_goals = []
-
-    for goal in goals:
-        if total_emissions <= goal.target_reduction:
-            goal.achieved = True
-            achieved_goals.append(goal)
-            db.commit()
-    
+    # Every goal the current total meets is marked and returned by one UPDATE ... RETURNING
+    stmt = update(Goal).where(Goal.user_id == user_id, Goal.target_reduction >= total_emissions).values(achieved=True)
+    achieved_goals = db.execute(
+        select(Goal).from_statement(stmt.returning(*Goal.__table__.columns)).execution_options(populate_existing=True)
+    ).scalars().all()
+    for goal in achieved_goals:
+        db.expunge(goal)
+    db.commit()
     return achieved_goals
\ No newline at end of file
@@ -0,0 +1,375 @@
+"""Running per-user emission totals and time-bucketed rollups.
+
+The activity log write paths in ``crud`` call :func:`apply_deltas` in the
+same transaction as the log change, and factor writes are followed by
+:func:`recompute_activity_types` for the types they touch, so reading a
+user's emissions is a primary-key lookup instead of a scan over their
+history, and emissions over time are read from daily, weekly and monthly
+rollup rows. Rebuilds and
+verification count the days ``retention`` has compacted alongside the raw
+logs that are left.
+
+Usage:
+    python -m backend.app.emission_totals rebuild [--user-id 1 --user-id 2]
+    python -m backend.app.emission_totals recompute --activity-type car_travel
+    python -m backend.app.emission_totals verify
+"""
+import argparse
+import json
+import logging
+import math
+import time
+from collections import defaultdict
+from datetime import timedelta, timezone
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from backend.app.models import ActivityLog, CompactedActivityLog, EmissionRollup, User, UserActivityTotal, UserEmissionTotal
+import backend.app.factor_registry as factor_registry
+import backend.app.etags as etags
+
+GRANULARITIES = ("day", "week", "month")
+
+# Users whose logs are folded together by one rebuild pass
+REBUILD_USER_BATCH = 500
+
+# Rows per multi-row upsert statement, well below the bind parameter limits
+UPSERT_CHUNK_SIZE = 1000
+
+# Logs streamed per fetch when a factor change recomputes a type
+RECOMPUTE_FETCH_SIZE = 10000
+
+logger = logging.getLogger(__name__)
+
+_DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def bucket_start(date, granularity: str):
+    """Start of the day, ISO week or month containing ``date``, as naive UTC."""
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    day = date.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown granularity: {granularity}")
+
+
+def log_delta(deltas, user_id, activity_type, value, date, snapshot, sign=1):
+    """Accumulate one log's contribution into ``deltas`` keyed by (user_id, activity_type, day).
+
+    Emissions use the factor in effect on ``date`` in the factor registry ``snapshot``.
+    """
+    if user_id is None:
+        return
+    entry = deltas[(user_id, activity_type, bucket_start(date, "day"))]
+    entry[0] += sign * value
+    entry[1] += sign * value * snapshot.factor_at(activity_type, date)
+    entry[2] += sign
+
+
+def new_deltas():
+    return defaultdict(lambda: [0.0, 0.0, 0])
+
+
+def upsert_sums(db: Session, model, keys, rows, columns):
+    """Insert ``rows`` into ``model``, adding ``columns`` onto rows whose ``keys`` already exist."""
+    insert = _DIALECT_INSERTS.get(db.get_bind().dialect.name)
+    if insert is not None:
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            stmt = insert(model).values(rows[start:start + UPSERT_CHUNK_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=keys,
+                set_={column: getattr(model, column) + getattr(stmt.excluded, column) for column in columns}
+            )
+            db.execute(stmt)
+        return
+    for row in rows:
+        existing = db.query(model).filter(*(getattr(model, key) == row[key] for key in keys)).with_for_update().first()
+        if existing is None:
+            db.add(model(**row))
+        else:
+            for column in columns:
+                setattr(existing, column, getattr(existing, column) + row[column])
+    db.flush()
+
+
+def _add(rows, key, **values):
+    row = rows.get(key)
+    if row is None:
+        rows[key] = row = dict(values)
+        return
+    for column in ("total_value", "total_emissions", "log_count"):
+        if column in values:
+            row[column] += values[column]
+
+
+def delta_rows(deltas):
+    """Rollup, per-type and per-user rows adding up ``deltas``, for :func:`apply_delta_rows`."""
+    rollup_rows = {}
+    activity_rows = {}
+    user_rows = {}
+    for (user_id, activity_type, day), (value, emissions, count) in deltas.items():
+        for granularity in GRANULARITIES:
+            start = bucket_start(day, granularity)
+            _add(rollup_rows, (user_id, granularity, start, activity_type),
+                 user_id=user_id, granularity=granularity, bucket_start=start, activity_type=activity_type,
+                 total_value=value, total_emissions=emissions, log_count=count)
+        _add(activity_rows, (user_id, activity_type),
+             user_id=user_id, activity_type=activity_type, total_value=value, total_emissions=emissions, log_count=count)
+        _add(user_rows, user_id, user_id=user_id, total_emissions=emissions, log_count=count)
+
+    # Sorted keys keep the lock order stable between concurrent writers
+    def ordered(rows):
+        return [rows[key] for key in sorted(rows)]
+
+    return ordered(rollup_rows), ordered(activity_rows), ordered(user_rows)
+
+
+def apply_delta_rows(db: Session, rows):
+    """Add the rows from :func:`delta_rows` to the totals and rollup tables without committing."""
+    rollup_rows, activity_rows, user_rows = rows
+    if not user_rows:
+        return
+    upsert_sums(db, EmissionRollup, ["user_id", "granularity", "bucket_start", "activity_type"], rollup_rows, ["total_value", "total_emissions", "log_count"])
+    upsert_sums(db, UserActivityTotal, ["user_id", "activity_type"], activity_rows, ["total_value", "total_emissions", "log_count"])
+    upsert_sums(db, UserEmissionTotal, ["user_id"], user_rows, ["total_emissions", "log_count"])
+    etags.bump(db, *(etags.user_emissions(row["user_id"]) for row in user_rows))
+
+
+def apply_deltas(db: Session, deltas):
+    """Add accumulated deltas to the totals and rollup tables without committing."""
+    apply_delta_rows(db, delta_rows(deltas))
+
+
+def delete_user_totals(db: Session, user_ids):
+    """Remove every derived row for ``user_ids`` without committing."""
+    for model in (EmissionRollup, UserActivityTotal, UserEmissionTotal):
+        db.query(model).filter(model.user_id.in_(user_ids)).delete(synchronize_session=False)
+    etags.bump(db, *(etags.user_emissions(user_id) for user_id in user_ids))
+
+
+def _aggregate_logs(db: Session, user_ids=None):
+    """``{(user_id, activity_type): [total_value, total_emissions, log_count]}`` over raw and compacted logs."""
+    factor = factor_registry.factor_expression(factor_registry.get_snapshot(db), ActivityLog.activity_type, ActivityLog.date)
+    query = db.query(
+        ActivityLog.user_id,
+        ActivityLog.activity_type,
+        func.sum(ActivityLog.activity_value).label("total_value"),
+        func.sum(ActivityLog.activity_value * factor).label("total_emissions"),
+        func.count().label("log_count")
+    ).filter(ActivityLog.user_id.isnot(None))
+    compacted = db.query(
+        CompactedActivityLog.user_id,
+        CompactedActivityLog.activity_type,
+        func.sum(CompactedActivityLog.total_value).label("total_value"),
+        func.sum(CompactedActivityLog.total_emissions).label("total_emissions"),
+        func.sum(CompactedActivityLog.log_count).label("log_count")
+    )
+    if user_ids is not None:
+        query = query.filter(ActivityLog.user_id.in_(user_ids))
+        compacted = compacted.filter(CompactedActivityLog.user_id.in_(user_ids))
+
+    totals = new_deltas()
+    for source, model in ((query, ActivityLog), (compacted, CompactedActivityLog)):
+        for row in source.group_by(model.user_id, model.activity_type):
+            entry = totals[(row.user_id, row.activity_type)]
+            entry[0] += float(row.total_value)
+            entry[1] += float(row.total_emissions)
+            entry[2] += int(row.log_count)
+    return totals
+
+
+def rebuild_totals(db: Session, user_ids=None):
+    """Recompute totals and rollups from the raw logs for ``user_ids`` (or everyone) without committing.
+
+    Users are processed in batches so the in-memory deltas stay bounded.
+    """
+    if user_ids is None:
+        user_ids = {row.user_id for row in db.query(ActivityLog.user_id).filter(ActivityLog.user_id.isnot(None)).distinct()}
+        user_ids.update(row.user_id for row in db.query(CompactedActivityLog.user_id).distinct())
+        etags.bump(db, *(etags.user_emissions(row.user_id) for row in db.query(UserEmissionTotal.user_id)))
+        for model in (EmissionRollup, UserActivityTotal, UserEmissionTotal):
+            db.query(model).delete(synchronize_session=False)
+    else:
+        delete_user_totals(db, user_ids)
+
+    snapshot = factor_registry.get_snapshot(db)
+    rebuilt = 0
+    user_ids = sorted(user_ids)
+    for start in range(0, len(user_ids), REBUILD_USER_BATCH):
+        batch = user_ids[start:start + REBUILD_USER_BATCH]
+        deltas = new_deltas()
+        logs = db.query(ActivityLog.user_id, ActivityLog.activity_type, ActivityLog.activity_value, ActivityLog.date).filter(
+            ActivityLog.user_id.in_(batch)
+        ).yield_per(10000)
+        for log in logs:
+            log_delta(deltas, log.user_id, log.activity_type, log.activity_value, log.date, snapshot)
+        # Compacted days keep the emissions worked out when they were compacted
+        for day in db.query(CompactedActivityLog).filter(CompactedActivityLog.user_id.in_(batch)):
+            entry = deltas[(day.user_id, day.activity_type, day.day)]
+            entry[0] += day.total_value
+            entry[1] += day.total_emissions
+            entry[2] += day.log_count
+        apply_deltas(db, deltas)
+        rebuilt += len({key[0] for key in deltas})
+    return rebuilt
+
+
+def _recompute_users(db: Session, activity_types, user_ids, snapshot):
+    # The users' log rows of the types are locked before their totals are read, so log
+    # writes still open on them commit first and later ones wait for this batch
+    deltas = new_deltas()
+    logs = db.execute(
+        select(ActivityLog.user_id, ActivityLog.activity_type, ActivityLog.activity_value, ActivityLog.date).where(
+            ActivityLog.user_id.in_(user_ids), ActivityLog.activity_type.in_(activity_types)
+        ).with_for_update().execution_options(stream_results=True, max_row_buffer=RECOMPUTE_FETCH_SIZE)
+    )
+    for rows in logs.partitions(RECOMPUTE_FETCH_SIZE):
+        for log in rows:
+            log_delta(deltas, log.user_id, log.activity_type, log.activity_value, log.date, snapshot)
+    for day in db.query(CompactedActivityLog).filter(CompactedActivityLog.user_id.in_(user_ids), CompactedActivityLog.activity_type.in_(activity_types)):
+        entry = deltas[(day.user_id, day.activity_type, day.day)]
+        entry[0] += day.total_value
+        entry[1] += day.total_emissions
+        entry[2] += day.log_count
+
+    # Take the types' old share out of the user totals; apply_deltas adds the new one back
+    removed = {}
+    old = db.query(UserActivityTotal).filter(
+        UserActivityTotal.user_id.in_(user_ids), UserActivityTotal.activity_type.in_(activity_types)
+    ).order_by(UserActivityTotal.user_id, UserActivityTotal.activity_type).with_for_update()
+    for row in old:
+        _add(removed, row.user_id, user_id=row.user_id, total_emissions=-row.total_emissions, log_count=-row.log_count)
+    upsert_sums(db, UserEmissionTotal, ["user_id"], [removed[key] for key in sorted(removed)], ["total_emissions", "log_count"])
+    for model in (EmissionRollup, UserActivityTotal):
+        db.query(model).filter(model.user_id.in_(user_ids), model.activity_type.in_(activity_types)).delete(synchronize_session=False)
+    etags.bump(db, *(etags.user_emissions(user_id) for user_id in removed))
+    apply_deltas(db, deltas)
+
+
+def recompute_activity_types(db: Session, activity_types, batch_size: int = REBUILD_USER_BATCH) -> int:
+    """Recompute every user's totals and rollups of ``activity_types`` with the current factors.
+
+    Run after a factor change has been committed. Users are taken
+    ``batch_size`` at a time, each batch in a transaction of its own holding
+    row locks on those users and their logs of the types only; log inserts
+    for them wait on the user row and read the factors once it is released.
+    Compacted days keep the emissions they were compacted with. Returns the
+    number of users looked at.
+    """
+    activity_types = sorted(set(activity_types))
+    if not activity_types:
+        return 0
+    done = 0
+    after = None
+    while True:
+        try:
+            query = select(User.user_id).order_by(User.user_id).limit(batch_size).with_for_update()
+            if after is not None:
+                query = query.where(User.user_id > after)
+            user_ids = db.execute(query).scalars().all()
+            if user_ids:
+                _recompute_users(db, activity_types, user_ids, factor_registry.get_snapshot(db))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        done += len(user_ids)
+        if len(user_ids) < batch_size:
+            return done
+        after = user_ids[-1]
+
+
+def recompute_in_background(bind, activity_types, batch_size: int = REBUILD_USER_BATCH) -> int:
+    """``recompute_activity_types`` on a session of its own, for a background task started by a factor write."""
+    started = time.perf_counter()
+    with Session(bind=bind) as db:
+        done = recompute_activity_types(db, activity_types, batch_size)
+    logger.info("Recomputed %s for %d users in %.2fs", ", ".join(sorted(set(activity_types))), done, time.perf_counter() - started)
+    return done
+
+
+def get_series(db: Session, user_id: int, granularity: str, start=None, end=None):
+    """Emissions per bucket between ``start`` and ``end`` (inclusive), oldest first."""
+    query = db.query(EmissionRollup).filter(
+        EmissionRollup.user_id == user_id,
+        EmissionRollup.granularity == granularity,
+        EmissionRollup.log_count > 0
+    )
+    if start is not None:
+        query = query.filter(EmissionRollup.bucket_start >= bucket_start(start, granularity))
+    if end is not None:
+        query = query.filter(EmissionRollup.bucket_start <= bucket_start(end, granularity))
+
+    points = {}
+    for row in query.order_by(EmissionRollup.bucket_start, EmissionRollup.activity_type):
+        point = points.setdefault(row.bucket_start, {"bucket_start": row.bucket_start, "total_emissions": 0.0, "by_activity_type": {}})
+        point["total_emissions"] += row.total_emissions
+        point["by_activity_type"][row.activity_type] = row.total_emissions
+    return list(points.values())
+
+
+def verify_totals(db: Session, user_ids=None):
+    """Compare stored per-type totals with the raw and compacted logs and return the mismatches."""
+    expected = _aggregate_logs(db, user_ids)
+    query = db.query(UserActivityTotal)
+    if user_ids is not None:
+        query = query.filter(UserActivityTotal.user_id.in_(user_ids))
+    stored = {(row.user_id, row.activity_type): row for row in query.all()}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        want = expected.get(key)
+        have = stored.get(key)
+        want_values = (want[1], want[2]) if want else (0.0, 0)
+        have_values = (have.total_emissions, have.log_count) if have else (0.0, 0)
+        if want_values[1] != have_values[1] or not math.isclose(want_values[0], have_values[0], rel_tol=1e-9, abs_tol=1e-6):
+            mismatches.append({
+                "user_id": key[0],
+                "activity_type": key[1],
+                "stored_emissions": have_values[0],
+                "expected_emissions": want_values[0],
+                "stored_count": have_values[1],
+                "expected_count": want_values[1],
+            })
+    return mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the per-user emission totals and rollup tables.")
+    parser.add_argument("command", choices=["rebuild", "recompute", "verify"])
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids", help="limit to these users (repeatable)")
+    parser.add_argument("--activity-type", action="append", dest="activity_types", default=[], help="activity type to recompute (repeatable)")
+    args = parser.parse_args(argv)
+    if args.command == "recompute" and not args.activity_types:
+        parser.error("recompute needs at least one --activity-type")
+
+    from backend.app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.command == "rebuild":
+            rebuilt = rebuild_totals(db, args.user_ids)
+            db.commit()
+            print(f"Rebuilt totals for {rebuilt} users")
+        elif args.command == "recompute":
+            done = recompute_activity_types(db, args.activity_types)
+            print(f"Recomputed {', '.join(sorted(set(args.activity_types)))} for {done} users")
+        mismatches = verify_totals(db, args.user_ids)
+    finally:
+        db.close()
+    print(json.dumps(mismatches, indent=2))
+    if mismatches:
+        raise SystemExit(f"{len(mismatches)} totals do not match the activity logs")
+    print("Totals match the activity logs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Vectorised emissions for the whole user population.
+
+One query pulls the ``(user_id, activity_type, activity_value, date)``
+columns of every log into NumPy arrays. Activity types are mapped to integer
+codes, the factor in effect on each log's date is found with one
+``np.searchsorted`` per activity type over its factor timeline, and the
+per-user sums are reduced with ``np.bincount``. Days compacted by
+``retention`` are added from their stored sums.
+
+Usage:
+    python -m backend.app.emissions_engine > footprints.csv
+"""
+import argparse
+import csv
+import logging
+import sys
+import time
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from backend.app.models import ActivityLog, CompactedActivityLog
+import backend.app.factor_registry as factor_registry
+
+# Rows fetched per round trip while streaming the log columns
+FETCH_CHUNK_SIZE = 100000
+
+# Log dates are naive UTC timestamps
+DATE_DTYPE = "datetime64[us]"
+
+logger = logging.getLogger(__name__)
+
+
+def load_log_columns(db: Session, chunk_size: int = FETCH_CHUNK_SIZE):
+    """Return ``(user_ids, type_codes, values, dates, activity_types)`` for every log.
+
+    Rows come back in ``log_id`` order and ``activity_types[code]`` is the
+    activity type behind each code.
+    """
+    codes = {}
+    chunks = ([], [], [], [])
+    query = db.query(ActivityLog.user_id, ActivityLog.activity_type, ActivityLog.activity_value, ActivityLog.date).filter(
+        ActivityLog.user_id.isnot(None)
+    ).order_by(ActivityLog.log_id).yield_per(chunk_size)
+
+    batch = []
+    for row in query:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            _append_chunk(batch, codes, chunks)
+            batch = []
+    if batch:
+        _append_chunk(batch, codes, chunks)
+
+    if not chunks[0]:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64), np.empty(0, DATE_DTYPE), []
+    return tuple(np.concatenate(chunk) for chunk in chunks) + (list(codes),)
+
+
+def _append_chunk(rows, codes, chunks):
+    count = len(rows)
+    user_chunks, code_chunks, value_chunks, date_chunks = chunks
+    user_chunks.append(np.fromiter((row[0] for row in rows), np.int64, count))
+    code_chunks.append(np.fromiter((codes.setdefault(row[1], len(codes)) for row in rows), np.int64, count))
+    value_chunks.append(np.fromiter((row[2] for row in rows), np.float64, count))
+    date_chunks.append(np.fromiter((row[3] for row in rows), DATE_DTYPE, count))
+
+
+def timeline_factors(timeline, dates):
+    """Factor in effect on each of ``dates`` according to a :class:`FactorTimeline`."""
+    factors = np.asarray(timeline.factors, dtype=np.float64)
+    if not timeline.boundaries:
+        return np.full(len(dates), factors[0])
+    boundaries = np.array(timeline.boundaries, dtype=DATE_DTYPE)
+    return factors[np.searchsorted(boundaries, dates, side="right")]
+
+
+def row_factors(type_codes, dates, activity_types, snapshot):
+    """Per-log factors for parallel code/date arrays; unknown types contribute nothing."""
+    factors = np.zeros(len(type_codes), dtype=np.float64)
+    for code, activity_type in enumerate(activity_types):
+        timeline = snapshot.timelines.get(activity_type)
+        if timeline is None:
+            continue
+        mask = type_codes == code
+        factors[mask] = timeline_factors(timeline, dates[mask])
+    return factors
+
+
+def reduce_emissions(user_ids, values, factors):
+    """Per-user emission totals for parallel log arrays.
+
+    Returns ``(users, totals)`` with ``users`` sorted. ``np.bincount`` adds
+    the weights in array order, so each total is bit-for-bit the same as
+    summing ``value * factor`` row by row in that order.
+    """
+    users, user_index = np.unique(user_ids, return_inverse=True)
+    totals = np.bincount(user_index, weights=values * factors, minlength=len(users))
+    return users, totals
+
+
+def compute_all_user_emissions(db: Session):
+    """Emission totals for every user with logs, as ``{user_id: total}``."""
+    user_ids, type_codes, values, dates, activity_types = load_log_columns(db)
+    factors = row_factors(type_codes, dates, activity_types, factor_registry.get_snapshot(db))
+    users, totals = reduce_emissions(user_ids, values, factors)
+    footprints = dict(zip(users.tolist(), totals.tolist()))
+    compacted = db.query(CompactedActivityLog.user_id, func.sum(CompactedActivityLog.total_emissions)).group_by(CompactedActivityLog.user_id)
+    for user_id, emissions in compacted:
+        footprints[user_id] = footprints.get(user_id, 0.0) + float(emissions)
+    return footprints
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write every user's emission total as CSV to stdout.")
+    parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    from backend.app.database import SessionLocal
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        totals = compute_all_user_emissions(db)
+    finally:
+        db.close()
+    logger.info("Computed footprints for %d users in %.2fs", len(totals), time.perf_counter() - started)
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(["user_id", "total_emissions"])
+    writer.writerows(sorted(totals.items()))
+
+
+if __name__ == "__main__":
+    main()
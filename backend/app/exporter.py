@@ -0,0 +1,121 @@
+"""Streaming export of a user's history as NDJSON or CSV.
+
+Activity logs, goals, reports and achievements are read as plain rows from
+server-side cursors and encoded chunk by chunk, so memory use stays flat no
+matter how long the history is and no ORM objects or Pydantic models are
+built along the way.
+
+Logs that ``retention`` has compacted are exported as ``compacted_day``
+records, one per (activity_type, day) with the summed value, emissions and
+log count. When retention archived the raw rows as well they also appear as
+``archived_activity_log`` records; those are the logs behind the compacted
+days, not additional history.
+
+Usage:
+    python -m backend.app.exporter 42 > history.ndjson
+    python -m backend.app.exporter 42 --format csv > history.csv
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import datetime
+import orjson
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from backend.app.models import Achievement, ActivityLog, ArchivedActivityLog, CompactedActivityLog, Goal, Report
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+# Rows fetched from the server-side cursor and encoded per chunk
+EXPORT_CHUNK_SIZE = 1000
+
+# (record_type, model, exported columns, sort columns)
+EXPORT_SECTIONS = (
+    ("activity_log", ActivityLog,
+     (ActivityLog.log_id, ActivityLog.activity_type, ActivityLog.activity_value, ActivityLog.date),
+     (ActivityLog.date, ActivityLog.log_id)),
+    ("archived_activity_log", ArchivedActivityLog,
+     (ArchivedActivityLog.log_id, ArchivedActivityLog.activity_type, ArchivedActivityLog.activity_value, ArchivedActivityLog.date, ArchivedActivityLog.archived_at),
+     (ArchivedActivityLog.date, ArchivedActivityLog.log_id)),
+    ("compacted_day", CompactedActivityLog,
+     (CompactedActivityLog.activity_type, CompactedActivityLog.day, CompactedActivityLog.total_value, CompactedActivityLog.total_emissions, CompactedActivityLog.log_count),
+     (CompactedActivityLog.day, CompactedActivityLog.activity_type)),
+    ("goal", Goal,
+     (Goal.goal_id, Goal.target_reduction, Goal.deadline, Goal.achieved),
+     (Goal.deadline, Goal.goal_id)),
+    ("report", Report,
+     (Report.report_id, Report.report_data, Report.generated_date),
+     (Report.generated_date, Report.report_id)),
+    ("achievement", Achievement,
+     (Achievement.achievement_id, Achievement.achievement_type, Achievement.date_awarded),
+     (Achievement.date_awarded, Achievement.achievement_id)),
+)
+
+# Columns shared between sections, such as activity_type, get a single CSV field
+CSV_FIELDS = list(dict.fromkeys(["record_type"] + [column.key for _, _, columns, _ in EXPORT_SECTIONS for column in columns]))
+
+
+def iter_records(db: Session, user_id: int, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield lists of up to ``chunk_size`` export records (dicts), section by section."""
+    for record_type, model, columns, order in EXPORT_SECTIONS:
+        query = select(*columns).where(model.user_id == user_id).order_by(*order)
+        result = db.execute(query.execution_options(stream_results=True, max_row_buffer=chunk_size))
+        for rows in result.partitions(chunk_size):
+            yield [{"record_type": record_type, **row._mapping} for row in rows]
+
+
+def _csv_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_chunks(chunks, fmt: str):
+    """Encode record chunks as bytes; CSV output starts with a header row."""
+    if fmt == "ndjson":
+        for records in chunks:
+            yield b"".join(orjson.dumps(record) + b"\n" for record in records)
+    elif fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, restval="")
+        writer.writeheader()
+        yield buffer.getvalue().encode()
+        for records in chunks:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows({key: _csv_value(value) for key, value in record.items()} for record in records)
+            yield buffer.getvalue().encode()
+    else:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+
+def stream_user_history(bind, user_id: int, fmt: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Encoded export of ``user_id``'s history on a session of its own.
+
+    The generator opens the session itself because a ``StreamingResponse`` is
+    iterated after the request's dependencies, and their session, are done.
+    """
+    with Session(bind=bind) as db:
+        yield from encode_chunks(iter_records(db, user_id, chunk_size), fmt)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a user's history to stdout as NDJSON or CSV.")
+    parser.add_argument("user_id", type=int, help="user to export")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson", help="output format")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="rows fetched per round trip")
+    args = parser.parse_args(argv)
+
+    from backend.app.database import get_engine
+
+    for chunk in stream_user_history(get_engine(), args.user_id, args.format, args.chunk_size):
+        sys.stdout.buffer.write(chunk)
+    sys.stdout.buffer.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""In-process registry of emission factors.
+
+The factors from the ``emission_factors`` table, laid over the built-in
+defaults, are held in an immutable snapshot with a version number. Emission
+computations read the snapshot instead of querying the table; writes through
+``crud`` call :func:`refresh`, which loads a new snapshot and swaps it in
+with a single assignment so readers never see a half-built mapping.
+
+A factor row applies from ``valid_from`` (inclusive) to ``valid_to``
+(exclusive), either end being open when NULL. For every activity type the
+rows are flattened into a :class:`FactorTimeline` of sorted boundaries, so
+the factor in effect on a log's date is one ``bisect`` (or, for arrays, one
+``np.searchsorted``) away. Where rows overlap the newest one wins.
+
+Every factor write bumps the ``emission_factors`` counter in
+``resource_versions`` in its own transaction, and :func:`get_snapshot` reads
+that one row by primary key on each call, so a write made by another worker
+process is picked up by the next emission computation here instead of old
+factors being applied meanwhile. Writes made straight to the table, without
+the counter, are picked up once a snapshot is older than
+``SNAPSHOT_TTL_SECONDS``.
+"""
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Mapping, Tuple
+from sqlalchemy import case
+from sqlalchemy.orm import Session
+from backend.app.models import EmissionFactor
+import backend.app.etags as etags
+
+# Factors used for activity types that have no row in the emission_factors table
+DEFAULT_EMISSION_FACTORS = {
+    "car_travel": 0.21,
+    "public_transport": 0.1,
+    "electricity_usage": 0.5,
+    "natural_gas_usage": 2.2,
+    "waste_generation": 0.3,
+    "water_usage": 0.001,
+    "air_travel": 0.25,
+    "food_consumption_meat": 27,
+    "food_consumption_vegetables": 2,
+    "clothing_purchases": 14
+}
+
+# How long a snapshot is trusted before it is reloaded from the table
+SNAPSHOT_TTL_SECONDS = 300
+
+
+def _naive_utc(date):
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+
+@dataclass(frozen=True)
+class FactorTimeline:
+    """Factors of one activity type over time.
+
+    ``factors[i]`` applies to dates before ``boundaries[i]`` and on or after
+    ``boundaries[i - 1]``; the last factor applies from the last boundary on.
+    """
+    boundaries: Tuple[datetime, ...]
+    factors: Tuple[float, ...]
+
+    def at(self, date):
+        return self.factors[bisect_right(self.boundaries, _naive_utc(date))]
+
+
+@dataclass(frozen=True)
+class FactorSnapshot:
+    version: int
+    # The resource_versions counter of the emission factors the snapshot was loaded at
+    source_version: int
+    factors: Mapping[str, float]
+    timelines: Mapping[str, FactorTimeline]
+    loaded_at: float
+
+    def get(self, activity_type: str, default=0):
+        """Factor in effect when the snapshot was loaded."""
+        return self.factors.get(activity_type, default)
+
+    def factor_at(self, activity_type: str, date):
+        """Factor in effect on ``date``; unknown types contribute nothing."""
+        timeline = self.timelines.get(activity_type)
+        return timeline.at(date) if timeline is not None else 0
+
+
+_snapshot = None
+_version = 0
+# Ticket of the load behind the current snapshot; loads that started earlier do not replace it
+_loads_started = 0
+_installed_load = 0
+_lock = threading.Lock()
+
+def build_timeline(rows, default=None):
+    """Flatten ``(emission_factor, valid_from, valid_to)`` rows, oldest first, into a timeline.
+
+    Dates no row covers fall back to ``default`` (0 when there is none).
+    """
+    rows = [(factor, valid_from and _naive_utc(valid_from), valid_to and _naive_utc(valid_to)) for factor, valid_from, valid_to in rows]
+    points = sorted({date for _, valid_from, valid_to in rows for date in (valid_from, valid_to) if date is not None})
+    boundaries, factors = [], []
+    for index in range(len(points) + 1):
+        start = points[index - 1] if index else None
+        end = points[index] if index < len(points) else None
+        factor = default or 0
+        for row_factor, valid_from, valid_to in rows:
+            starts_in_time = valid_from is None or (start is not None and valid_from <= start)
+            ends_in_time = valid_to is None or (end is not None and valid_to >= end)
+            if starts_in_time and ends_in_time:
+                factor = row_factor
+        # Neighbouring segments with the same factor need no boundary between them
+        if factors and factors[-1] == factor:
+            boundaries.pop()
+        else:
+            factors.append(factor)
+        if end is not None:
+            boundaries.append(end)
+    return FactorTimeline(boundaries=tuple(boundaries), factors=tuple(factors))
+
+
+def _load(db: Session):
+    rows = {}
+    # The table does not enforce one row per activity type, the newest row wins
+    for row in db.query(EmissionFactor).order_by(EmissionFactor.factor_id):
+        rows.setdefault(row.activity_type, []).append((row.emission_factor, row.valid_from, row.valid_to))
+    timelines = {}
+    for activity_type in set(DEFAULT_EMISSION_FACTORS) | set(rows):
+        timelines[activity_type] = build_timeline(rows.get(activity_type, []), DEFAULT_EMISSION_FACTORS.get(activity_type))
+    return timelines
+
+
+def refresh(db: Session, source_version=None):
+    """Load the factors from ``db`` and atomically replace the current snapshot.
+
+    ``source_version`` is the emission factors counter when the caller has
+    just read it; it is read before the factors otherwise, so a write landing
+    in between only causes one more reload.
+
+    The lock is only held to take a ticket and to swap the snapshot, never
+    across the query: ``AsyncSession.run_sync`` callers hand the event loop
+    back while it runs, and another request blocking on the lock there would
+    stall the loop for good. Concurrent loads may overlap; the one that
+    started last wins.
+    """
+    global _snapshot, _version, _loads_started, _installed_load
+    with _lock:
+        _loads_started += 1
+        ticket = _loads_started
+    if source_version is None:
+        source_version = etags.get_version(db, etags.EMISSION_FACTORS)
+    timelines = _load(db)
+    now = datetime.utcnow()
+    factors = {activity_type: timeline.at(now) for activity_type, timeline in timelines.items()}
+    with _lock:
+        if ticket < _installed_load and _snapshot is not None:
+            return _snapshot
+        _version += 1
+        _installed_load = ticket
+        _snapshot = FactorSnapshot(
+            version=_version,
+            source_version=source_version,
+            factors=MappingProxyType(factors),
+            timelines=MappingProxyType(timelines),
+            loaded_at=time.monotonic()
+        )
+        return _snapshot
+
+
+def invalidate():
+    """Drop the current snapshot so the next read reloads it."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def get_snapshot(db: Session):
+    """Current snapshot, loading it through ``db`` when missing, expired or behind the factors counter."""
+    snapshot = _snapshot
+    if snapshot is None or time.monotonic() - snapshot.loaded_at > SNAPSHOT_TTL_SECONDS:
+        return refresh(db)
+    source_version = etags.get_version(db, etags.EMISSION_FACTORS)
+    if source_version != snapshot.source_version:
+        return refresh(db, source_version)
+    return snapshot
+
+
+def get_factors(db: Session):
+    """Read-only ``{activity_type: factor}`` mapping of the factors in effect now."""
+    return get_snapshot(db).factors
+
+
+def factor_expression(snapshot: FactorSnapshot, activity_type, date):
+    """SQL CASE giving the factor in effect for ``activity_type`` on ``date``."""
+    whens = []
+    for name, timeline in sorted(snapshot.timelines.items()):
+        factor = timeline.factors[0]
+        if timeline.boundaries:
+            factor = case(*zip((date < boundary for boundary in timeline.boundaries), timeline.factors), else_=timeline.factors[-1])
+        whens.append((activity_type == name, factor))
+    return case(*whens, else_=0)
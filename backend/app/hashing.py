@@ -0,0 +1,118 @@
+"""Argon2 password hashing off the event loop.
+
+Hashing and verifying a password is CPU-bound and takes tens of
+milliseconds, so it runs in a bounded pool, a process pool unless
+``PASSWORD_HASH_EXECUTOR=thread``, instead of in the request handler. At
+most ``PasswordHashSettings.pending_limit`` hashes run or wait at once; past
+that :class:`HashingBusy` is raised straight away and the auth routes answer
+503, so a login storm is turned away early instead of slowing down every
+other endpoint.
+
+The argon2 cost comes from the settings. Hashes made with other parameters
+still verify, and :func:`verify_and_update` returns a new hash for them, so
+stored hashes follow the configured cost as users log in.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+from backend.app.config import PasswordHashSettings, load_password_hash_settings
+
+
+class HashingBusy(Exception):
+    """The hashing pool already has its limit of hashes running or queued."""
+
+
+# passlib and the argon2 backend load on first use, in the process doing the hashing
+@lru_cache(maxsize=None)
+def get_pwd_context(time_cost: int, memory_cost: int, parallelism: int):
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["argon2"], deprecated="auto",
+        argon2__time_cost=time_cost, argon2__memory_cost=memory_cost, argon2__parallelism=parallelism
+    )
+
+
+# The pool's tasks: module-level so process workers can unpickle them
+def _hash(params: Tuple[int, int, int], password: str) -> str:
+    return get_pwd_context(*params).hash(password)
+
+
+def _verify_and_update(params: Tuple[int, int, int], password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    try:
+        return get_pwd_context(*params).verify_and_update(password, hashed)
+    except ValueError:
+        # Not an argon2 hash, e.g. a password stored before hashing was in place
+        return False, None
+
+
+class PasswordHasher:
+    """Runs hashing tasks in an executor, refusing new ones while ``pending_limit`` are unfinished."""
+
+    def __init__(self, settings: PasswordHashSettings):
+        self.params = (settings.time_cost, settings.memory_cost, settings.parallelism)
+        self.limit = settings.pending_limit
+        self.pending = 0
+        self._lock = threading.Lock()
+        if settings.executor == "process":
+            # Spawned workers do not inherit the server's threads, sockets or connections
+            self.executor = ProcessPoolExecutor(settings.workers, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self.executor = ThreadPoolExecutor(settings.workers, thread_name_prefix="password-hash")
+
+    def _release(self, future=None):
+        with self._lock:
+            self.pending -= 1
+
+    async def run(self, task, *args):
+        with self._lock:
+            if self.pending >= self.limit:
+                raise HashingBusy(f"{self.pending} password hashes pending")
+            self.pending += 1
+        try:
+            future = self.executor.submit(task, self.params, *args)
+        except BaseException:
+            self._release()
+            raise
+        # The slot is freed when the work finishes, even if the request awaiting it is cancelled
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_settings: Optional[PasswordHashSettings] = None
+
+
+def configure(settings: Optional[PasswordHashSettings] = None):
+    """Hash with ``settings`` (or the environment) from now on, shutting down any pool created so far."""
+    global _settings
+    _settings = settings
+    if get_hasher.cache_info().currsize:
+        get_hasher().shutdown()
+    for accessor in (get_settings, get_hasher):
+        accessor.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> PasswordHashSettings:
+    return _settings if _settings is not None else load_password_hash_settings()
+
+
+@lru_cache(maxsize=None)
+def get_hasher() -> PasswordHasher:
+    return PasswordHasher(get_settings())
+
+
+async def hash_password(password: str) -> str:
+    """Argon2 hash of ``password`` with the configured cost; raises :class:`HashingBusy` when saturated."""
+    return await get_hasher().run(_hash, password)
+
+
+async def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Whether ``password`` matches ``hashed``, and a rehash with the configured cost when it matches an outdated one."""
+    return await get_hasher().run(_verify_and_update, password, hashed)
@@ -0,0 +1,119 @@
+"""Streaming import of activity logs from CSV or NDJSON sources.
+
+Records are read one at a time and written in fixed-size chunks, so memory
+use stays flat regardless of the input size.
+
+Usage:
+    python -m backend.app.importer logs.csv
+    python -m backend.app.importer logs.ndjson --format ndjson --chunk-size 5000
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from sqlalchemy.orm import Session
+import backend.app.crud as crud
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Only the first errors are kept in the summary; the rest are just counted
+MAX_REPORTED_ERRORS = 100
+
+logger = logging.getLogger(__name__)
+
+
+def detect_format(filename: str):
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+    return None
+
+
+def iter_records(stream, fmt: str):
+    """Yield raw records from a text stream without reading it all at once."""
+    if fmt == "csv":
+        yield from csv.DictReader(stream)
+    elif fmt == "ndjson":
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Left to schema validation, which reports it as a bad row
+                yield line
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def import_activity_logs(db: Session, records, chunk_size: int = crud.ACTIVITY_LOG_CHUNK_SIZE, progress=None):
+    """Validate and insert activity logs chunk by chunk.
+
+    Each chunk is committed on its own. ``progress`` is called after every
+    chunk with the running summary.
+    """
+    summary = {"imported": 0, "failed": 0, "errors": [], "elapsed_seconds": 0.0, "rows_per_second": 0.0}
+    started = time.perf_counter()
+    processed = 0
+    chunk = []
+
+    def flush():
+        valid, errors = crud.validate_activity_log_batch(db, chunk, start_index=processed - len(chunk))
+        log_ids = crud.bulk_create_activity_logs(db, [log for _, log in valid], chunk_size=chunk_size)
+        summary["imported"] += len(log_ids)
+        summary["failed"] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(summary["errors"])
+        if room > 0:
+            summary["errors"].extend(errors[:room])
+        chunk.clear()
+
+        elapsed = time.perf_counter() - started
+        summary["elapsed_seconds"] = elapsed
+        summary["rows_per_second"] = processed / elapsed if elapsed else 0.0
+        logger.info(
+            "Processed %d rows (%d imported, %d failed) at %.0f rows/sec",
+            processed, summary["imported"], summary["failed"], summary["rows_per_second"],
+        )
+        if progress:
+            progress(summary)
+
+    for record in records:
+        chunk.append(record)
+        processed += 1
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream activity logs from a CSV or NDJSON file into the database.")
+    parser.add_argument("path", help="file to import")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="input format (defaults to the file extension)")
+    parser.add_argument("--chunk-size", type=int, default=crud.ACTIVITY_LOG_CHUNK_SIZE, help="rows written per transaction")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    if fmt is None:
+        parser.error("cannot infer the format from the file name, pass --format")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    from backend.app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8", newline="") as stream:
+            summary = import_activity_logs(db, iter_records(stream, fmt), chunk_size=args.chunk_size)
+    finally:
+        db.close()
+    print(json.dumps(summary, default=str, indent=2))
+
+
+if __name__ == "__main__":
+    main()
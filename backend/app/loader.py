@@ -0,0 +1,265 @@
+"""Bulk loading of activity logs and emission factors.
+
+On PostgreSQL the rows are streamed into a temporary staging table with
+``COPY ... FROM STDIN`` and then merged into the real table with set-based
+SQL, so foreign keys and de-duplication are still enforced by the database.
+Other engines fill the staging table with batched INSERTs and run the same
+merge, which keeps the behaviour testable against SQLite.
+
+Usage:
+    python -m backend.app.loader activity_logs logs.csv
+    python -m backend.app.loader emission_factors factors.csv
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import time
+from datetime import timezone
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, text
+from sqlalchemy.orm import Session
+from backend.app.schemas import ActivityLogCreate, EmissionFactorCreate
+import backend.app.emission_totals as emission_totals
+import backend.app.factor_registry as factor_registry
+import backend.app.etags as etags
+
+# Rows rendered per INSERT on engines without COPY support
+STAGING_CHUNK_SIZE = 5000
+
+logger = logging.getLogger(__name__)
+
+_staging_metadata = MetaData()
+
+activity_logs_staging = Table(
+    "activity_logs_staging", _staging_metadata,
+    Column("user_id", Integer),
+    Column("activity_type", String),
+    Column("activity_value", Float(53)),
+    Column("date", DateTime),
+    prefixes=["TEMPORARY"],
+)
+
+emission_factors_staging = Table(
+    "emission_factors_staging", _staging_metadata,
+    Column("activity_type", String),
+    Column("emission_factor", Float(53)),
+    Column("valid_from", DateTime),
+    Column("valid_to", DateTime),
+    prefixes=["TEMPORARY"],
+)
+
+_MERGE_ACTIVITY_LOGS = text("""
+    INSERT INTO activity_logs (user_id, activity_type, activity_value, date)
+    SELECT DISTINCT s.user_id, s.activity_type, s.activity_value, s.date
+    FROM activity_logs_staging s
+    JOIN users u ON u.user_id = s.user_id
+    WHERE NOT EXISTS (
+        SELECT 1 FROM activity_logs a
+        WHERE a.user_id = s.user_id
+          AND a.activity_type = s.activity_type
+          AND a.activity_value = s.activity_value
+          AND a.date = s.date
+    )
+""")
+
+_STAGED_USER_IDS = text("SELECT DISTINCT user_id FROM activity_logs_staging")
+
+_COUNT_UNKNOWN_USERS = text("""
+    SELECT COUNT(*) FROM activity_logs_staging s
+    WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.user_id = s.user_id)
+""")
+
+# A factor version is identified by its activity type and start date
+_UPDATE_EMISSION_FACTORS = text("""
+    UPDATE emission_factors
+    SET emission_factor = (
+            SELECT s.emission_factor FROM emission_factors_staging s
+            WHERE s.activity_type = emission_factors.activity_type
+              AND s.valid_from IS NOT DISTINCT FROM emission_factors.valid_from
+        ),
+        valid_to = (
+            SELECT s.valid_to FROM emission_factors_staging s
+            WHERE s.activity_type = emission_factors.activity_type
+              AND s.valid_from IS NOT DISTINCT FROM emission_factors.valid_from
+        )
+    WHERE EXISTS (
+        SELECT 1 FROM emission_factors_staging s
+        WHERE s.activity_type = emission_factors.activity_type
+          AND s.valid_from IS NOT DISTINCT FROM emission_factors.valid_from
+    )
+""")
+
+_INSERT_EMISSION_FACTORS = text("""
+    INSERT INTO emission_factors (activity_type, emission_factor, valid_from, valid_to)
+    SELECT s.activity_type, s.emission_factor, s.valid_from, s.valid_to
+    FROM emission_factors_staging s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM emission_factors e
+        WHERE e.activity_type = s.activity_type
+          AND e.valid_from IS NOT DISTINCT FROM s.valid_from
+    )
+""")
+
+
+class _CsvStream:
+    """Read-only file object rendering rows as CSV on demand for ``copy_expert``."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._pending = ""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._writer.writerow(row)
+            self._pending += self._buffer.getvalue()
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        if size < 0:
+            size = len(self._pending)
+        chunk, self._pending = self._pending[:size], self._pending[size:]
+        return chunk
+
+
+def _fill_staging(db: Session, staging: Table, rows, chunk_size: int):
+    """Create ``staging`` and stream ``rows`` (tuples in column order) into it."""
+    connection = db.connection()
+    staging.drop(connection, checkfirst=True)
+    staging.create(connection)
+    counted = 0
+
+    def counting(source):
+        nonlocal counted
+        for row in source:
+            counted += 1
+            yield row
+
+    if connection.dialect.name == "postgresql":
+        columns = ", ".join(column.name for column in staging.columns)
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {staging.name} ({columns}) FROM STDIN WITH (FORMAT csv)", _CsvStream(counting(rows)))
+        finally:
+            cursor.close()
+    else:
+        names = [column.name for column in staging.columns]
+        chunk = []
+        for row in counting(rows):
+            chunk.append(dict(zip(names, row)))
+            if len(chunk) >= chunk_size:
+                connection.execute(staging.insert(), chunk)
+                chunk = []
+        if chunk:
+            connection.execute(staging.insert(), chunk)
+    return counted
+
+
+def _activity_log_rows(records):
+    for line, record in enumerate(records, start=1):
+        try:
+            log = ActivityLogCreate.model_validate(record)
+        except ValueError as e:
+            raise ValueError(f"Invalid activity log on row {line}: {e}") from e
+        # COPY ignores the offset of an aware timestamp, so store UTC wall time
+        date = log.date
+        if date.tzinfo is not None:
+            date = date.astimezone(timezone.utc).replace(tzinfo=None)
+        yield (log.user_id, log.activity_type, log.activity_value, date)
+
+
+def load_activity_logs(db: Session, records, chunk_size: int = STAGING_CHUNK_SIZE):
+    """Load activity log records through a staging table in one transaction.
+
+    Rows for unknown users and rows identical to an existing log are skipped,
+    and the emission totals of the affected users are rebuilt afterwards.
+    Returns a summary of how many rows were staged, inserted and skipped.
+    """
+    started = time.perf_counter()
+    try:
+        staged = _fill_staging(db, activity_logs_staging, _activity_log_rows(records), chunk_size)
+        unknown_users = db.execute(_COUNT_UNKNOWN_USERS).scalar()
+        user_ids = [row.user_id for row in db.execute(_STAGED_USER_IDS)]
+        inserted = db.execute(_MERGE_ACTIVITY_LOGS).rowcount
+        if inserted:
+            emission_totals.rebuild_totals(db, user_ids)
+        activity_logs_staging.drop(db.connection())
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    elapsed = time.perf_counter() - started
+    summary = {
+        "staged": staged,
+        "inserted": inserted,
+        "skipped_unknown_user": unknown_users,
+        "skipped_duplicate": staged - inserted - unknown_users,
+        "elapsed_seconds": elapsed,
+    }
+    logger.info("Loaded %d of %d activity logs in %.2fs", inserted, staged, elapsed)
+    return summary
+
+
+def load_emission_factors(db: Session, records, chunk_size: int = STAGING_CHUNK_SIZE):
+    """Upsert emission factors by activity type and ``valid_from``; the last record for a pair wins."""
+    factors = {}
+    for line, record in enumerate(records, start=1):
+        if isinstance(record, dict):
+            # Empty CSV cells mean an open-ended validity period
+            record = {key: value for key, value in record.items() if value != ""}
+        try:
+            factor = EmissionFactorCreate.model_validate(record)
+        except ValueError as e:
+            raise ValueError(f"Invalid emission factor on row {line}: {e}") from e
+        factors[(factor.activity_type, factor.valid_from)] = (factor.emission_factor, factor.valid_to)
+
+    rows = ((activity_type, factor, valid_from, valid_to) for (activity_type, valid_from), (factor, valid_to) in factors.items())
+    started = time.perf_counter()
+    try:
+        staged = _fill_staging(db, emission_factors_staging, rows, chunk_size)
+        updated = db.execute(_UPDATE_EMISSION_FACTORS).rowcount
+        inserted = db.execute(_INSERT_EMISSION_FACTORS).rowcount
+        emission_factors_staging.drop(db.connection())
+        etags.bump(db, etags.EMISSION_FACTORS)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    factor_registry.refresh(db)
+    # The loaded types' totals are recomputed with the new factors in bounded batches
+    emission_totals.recompute_activity_types(db, {activity_type for activity_type, _ in factors})
+    elapsed = time.perf_counter() - started
+    logger.info("Loaded %d emission factors in %.2fs", staged, elapsed)
+    return {"staged": staged, "inserted": inserted, "updated": updated, "elapsed_seconds": elapsed}
+
+
+LOADERS = {
+    "activity_logs": load_activity_logs,
+    "emission_factors": load_emission_factors,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load a CSV file through a staging table.")
+    parser.add_argument("table", choices=sorted(LOADERS), help="table to load")
+    parser.add_argument("path", help="CSV file with a header row")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    from backend.app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        with open(args.path, encoding="utf-8", newline="") as stream:
+            summary = LOADERS[args.table](db, csv.DictReader(stream))
+    finally:
+        db.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,44 +1,30 @@
-from fastapi import FastAPI
-from backend.app.routers import users, activitylog, emissionfactor, goals, achievements, report, tips
-from backend.app.database import engine, Base, get_db
-import sys
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import ORJSONResponse
+from backend.app.routers import users, activitylog, emissionfactor, goals, achievements, report, tips, internal
+# `auth` below is the Google callback
+from backend.app.routers import auth as password_auth
+from backend.app.config import DatabaseSettings
+from backend.app.database import get_db, ReadYourWritesMiddleware
+from backend.app import database, pagination
 import os
+from functools import lru_cache
+from typing import Optional
 from sqlalchemy.orm import Session
-from authlib.integrations.starlette_client import OAuth, OAuthError
 from starlette.requests import Request
 from starlette.responses import RedirectResponse
-from dotenv import load_dotenv
 from fastapi import HTTPException, status, Depends
 from starlette.middleware.sessions import SessionMiddleware  # Import SessionMiddleware
 import logging
 import secrets
 
-
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
-# CORS 
+# CORS
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
-
-# Create the database tables
-Base.metadata.create_all(bind=engine)
-
-# Add SessionMiddleware for session management
-# app.add_middleware(SessionMiddleware, secret_key="SEcret1122#$%") 
-
 #Origins of frontend and backend
 origins = [
-    "http://localhost:5173", 
+    "http://localhost:5173",
     "https://accounts.google.com/"
 ]
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
 # Session secret key
 SESSION_SECRET_KEY = "12345ooo!"
@@ -48,31 +34,40 @@ if not SESSION_SECRET_KEY:
     except Exception as e:
         logging.error(f"Generated SESSION_SECRET_KEY: {str(e)}")
 
-app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET_KEY)
-
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=os.environ.get('client_ID'),
-    client_secret=os.environ.get('client_secret'),
-    authorize_url='https://accounts.google.com/o/oauth2/auth',
-    authorize_params=None,
-    access_token_url='https://accounts.google.com/o/oauth2/token',
-    access_token_params=None,
-    refresh_token_url=None,
-    redirect_uri='http://localhost:8000/auth/callback',
-    client_kwargs={'scope': 'openid email profile'}
-)
-
-@app.get('/auth/login')
+
+@lru_cache(maxsize=None)
+def get_oauth():
+    # authlib and its crypto stack are only imported once someone signs in with Google
+    from authlib.integrations.starlette_client import OAuth
+
+    oauth = OAuth()
+    oauth.register(
+        name='google',
+        client_id=os.environ.get('client_ID'),
+        client_secret=os.environ.get('client_secret'),
+        authorize_url='https://accounts.google.com/o/oauth2/auth',
+        authorize_params=None,
+        access_token_url='https://accounts.google.com/o/oauth2/token',
+        access_token_params=None,
+        refresh_token_url=None,
+        redirect_uri='http://localhost:8000/auth/callback',
+        client_kwargs={'scope': 'openid email profile'}
+    )
+    return oauth
+
+google_auth = APIRouter()
+
+@google_auth.get('/auth/login')
 async def login(request: Request):
      redirect_uri = request.url_for('auth')
      state = '1234567'
      request.session['state'] = state  # Store the state in the session
-     return await oauth.google.authorize_redirect(request, redirect_uri, state = state)
+     return await get_oauth().google.authorize_redirect(request, redirect_uri, state = state)
 
-@app.get('/auth/callback')
+@google_auth.get('/auth/callback')
 async def auth(request: Request, db: Session = Depends(get_db)):
+    from authlib.integrations.starlette_client import OAuthError
+
     try:
         # Log the state value stored in the session
         stored_state = request.session.get('state')
@@ -87,6 +82,7 @@ async def auth(request: Request, db: Session = Depends(get_db)):
         if stored_state != received_state:
             raise OAuthError('mismatching_state', 'State mismatch error.')
 
+        oauth = get_oauth()
         token = await oauth.google.authorize_access_token(request)
         user_info = await oauth.google.parse_id_token(request, token)
     except OAuthError as e:
@@ -103,22 +99,46 @@ async def auth(request: Request, db: Session = Depends(get_db)):
     # Redirect user after processing
     return RedirectResponse(url='/')
 
-# Include the routers
-app.include_router(users.router, prefix="/users", tags=["users"])
-app.include_router(activitylog.router, prefix="/api/activity-logs", tags=["activity_logs"]) 
-app.include_router(emissionfactor.router, prefix="/emission-factors", tags=["emission-factors"])
-app.include_router(goals.router, prefix="/goals", tags=["goals"])
-app.include_router(achievements.router, prefix="/achievements", tags=["achievements"])
-app.include_router(report.router, prefix="/reports", tags=["reports"])
-app.include_router(tips.router, prefix="/tips", tags=["tips"])
-
-
-
-
-
-
-
-
-@app.get("/")
+@google_auth.get("/")
 def read_root():
     return {"message": "Welcome to the EcoFootprint API"}
+
+
+def create_app(settings: Optional[DatabaseSettings] = None) -> FastAPI:
+    """Build the API; ``settings`` replaces the database settings from the environment.
+
+    Nothing here touches the database: engines are created on first use and
+    the schema is managed with ``alembic upgrade head``.
+    """
+    if settings is not None:
+        database.configure(settings)
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[pagination.NEXT_CURSOR_HEADER, "ETag"],
+    )
+    app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET_KEY)
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    # Include the routers
+    app.include_router(google_auth)
+    app.include_router(password_auth.router, prefix="/auth", tags=["auth"])
+    app.include_router(users.router, prefix="/users", tags=["users"])
+    app.include_router(activitylog.router, prefix="/api/activity-logs", tags=["activity_logs"])
+    app.include_router(emissionfactor.router, prefix="/emission-factors", tags=["emission-factors"])
+    app.include_router(goals.router, prefix="/goals", tags=["goals"])
+    app.include_router(achievements.router, prefix="/achievements", tags=["achievements"])
+    app.include_router(report.router, prefix="/reports", tags=["reports"])
+    app.include_router(tips.router, prefix="/tips", tags=["tips"])
+    app.include_router(internal.router, prefix="/internal", tags=["internal"])
+    return app
+
+
+# Entry point for `uvicorn backend.app.main:app`; `uvicorn --factory backend.app.main:create_app` also works
+app = create_app()
@@ -1,6 +1,6 @@
 # coding: utf-8
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, String, Integer
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Index, String, Integer
+from sqlalchemy.orm import backref, relationship
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -21,52 +21,74 @@ class Achievement(Base):
     __tablename__ = 'achievements'
 
     achievement_id = Column(Integer, primary_key=True)
-    user_id = Column(ForeignKey('users.user_id'))
+    user_id = Column(ForeignKey('users.user_id', ondelete='CASCADE'))
     achievement_type = Column(String, nullable=False)
     date_awarded = Column(DateTime, nullable=False)
 
-    user = relationship('User')
+    user = relationship('User', backref=backref('achievements', passive_deletes=True))
+
+    __table_args__ = (
+        Index('ix_achievements_user_id_date_awarded', 'user_id', 'date_awarded'),
+    )
 
 
 class ActivityLog(Base):
     __tablename__ = 'activity_logs'
 
     log_id = Column(Integer, primary_key=True)
-    user_id = Column(ForeignKey('users.user_id'))
+    user_id = Column(ForeignKey('users.user_id', ondelete='CASCADE'))
     activity_type = Column(String, nullable=False)
     activity_value = Column(Float(53), nullable=False)
     date = Column(DateTime, nullable=False)
 
-    user = relationship('User')
+    user = relationship('User', backref=backref('activity_logs', passive_deletes=True))
+
+    __table_args__ = (
+        Index('ix_activity_logs_user_id_date', 'user_id', 'date'),
+    )
 
 
 class Goal(Base):
     __tablename__ = 'goals'
 
     goal_id = Column(Integer, primary_key=True)
-    user_id = Column(ForeignKey('users.user_id'))
+    user_id = Column(ForeignKey('users.user_id', ondelete='CASCADE'))
     target_reduction = Column(Float(53), nullable=False)
     deadline = Column(DateTime, nullable=False)
     achieved = Column(Boolean, nullable=False)
 
-    user = relationship('User')
+    user = relationship('User', backref=backref('goals', passive_deletes=True))
+
+    __table_args__ = (
+        Index('ix_goals_user_id_deadline', 'user_id', 'deadline'),
+    )
 
 class EmissionFactor(Base):
     __tablename__ = 'emission_factors'
 
-    factor_id = Column(Integer, primary_key=True, index=True)
+    factor_id = Column(Integer, primary_key=True)
     activity_type = Column(String, nullable=False)
     emission_factor = Column(Float(53), nullable=False)
+    valid_from = Column(DateTime)
+    valid_to = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_emission_factors_activity_type_valid_from', 'activity_type', 'valid_from'),
+    )
 
 class Report(Base):
     __tablename__ = 'reports'
 
     report_id = Column(Integer, primary_key=True)
-    user_id = Column(ForeignKey('users.user_id'), nullable=False)
+    user_id = Column(ForeignKey('users.user_id', ondelete='CASCADE'), nullable=False)
     report_data = Column(String, nullable=False)
     generated_date = Column(DateTime, nullable=False)
 
-    user = relationship('User')
+    user = relationship('User', backref=backref('reports', passive_deletes=True))
+
+    __table_args__ = (
+        Index('ix_reports_user_id_generated_date', 'user_id', 'generated_date'),
+    )
 
 
 class Tip(Base):
@@ -75,7 +97,73 @@ class Tip(Base):
     tip_id = Column(Integer, primary_key=True)
     tip_text = Column(String, nullable=False)
     category = Column(String, nullable=False)
-    user_id = Column(ForeignKey('users.user_id'))
+    user_id = Column(ForeignKey('users.user_id', ondelete='CASCADE'))
+
+    user = relationship('User', backref=backref('tips', passive_deletes=True))
+
+    __table_args__ = (
+        Index('ix_tips_user_id', 'user_id'),
+    )
+
+
+class UserEmissionTotal(Base):
+    __tablename__ = 'user_emission_totals'
+
+    user_id = Column(ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    total_emissions = Column(Float(53), nullable=False)
+    log_count = Column(Integer, nullable=False)
+
+
+class UserActivityTotal(Base):
+    __tablename__ = 'user_activity_totals'
+
+    user_id = Column(ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    activity_type = Column(String, primary_key=True)
+    total_value = Column(Float(53), nullable=False)
+    total_emissions = Column(Float(53), nullable=False)
+    log_count = Column(Integer, nullable=False)
+
+
+class EmissionRollup(Base):
+    __tablename__ = 'emission_rollups'
+
+    user_id = Column(ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    granularity = Column(String, primary_key=True)
+    bucket_start = Column(DateTime, primary_key=True)
+    activity_type = Column(String, primary_key=True)
+    total_value = Column(Float(53), nullable=False)
+    total_emissions = Column(Float(53), nullable=False)
+    log_count = Column(Integer, nullable=False)
+
+
+class CompactedActivityLog(Base):
+    __tablename__ = 'compacted_activity_logs'
+
+    user_id = Column(ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True)
+    activity_type = Column(String, primary_key=True)
+    day = Column(DateTime, primary_key=True)
+    total_value = Column(Float(53), nullable=False)
+    total_emissions = Column(Float(53), nullable=False)
+    log_count = Column(Integer, nullable=False)
+
+
+class ArchivedActivityLog(Base):
+    __tablename__ = 'activity_log_archive'
+
+    log_id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer)
+    activity_type = Column(String, nullable=False)
+    activity_value = Column(Float(53), nullable=False)
+    date = Column(DateTime, nullable=False)
+    archived_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index('ix_activity_log_archive_user_id_date', 'user_id', 'date'),
+    )
+
 
-    user = relationship('User')
+class ResourceVersion(Base):
+    __tablename__ = 'resource_versions'
 
+    resource = Column(String, primary_key=True)
+    version = Column(BigInteger, nullable=False)
@@ -0,0 +1,69 @@
+"""Opaque cursors for keyset pagination of the list endpoints.
+
+A cursor wraps the primary key of the last row on a page. The next page is
+read with ``WHERE pk > :after ORDER BY pk LIMIT :limit``, which walks the
+primary key index and costs the same on page 10,000 as on page 1, unlike
+``OFFSET`` which has to skip every earlier row. Lists ordered by date carry
+the date of the last row as well and continue after ``(date, pk)``.
+
+List endpoints return the cursor for the following page in the
+``X-Next-Cursor`` header (enveloped responses also carry it as
+``next_cursor``); it is absent on the last page.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(after_id: int, after_date: Optional[datetime] = None) -> str:
+    payload = {"after": after_id}
+    if after_date is not None:
+        payload["date"] = after_date.isoformat()
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def _decode(cursor: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        after_id = payload["after"]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(after_id, int) or isinstance(after_id, bool):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return payload
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Primary key to continue after, or ``None`` without a cursor; 400 on a malformed one."""
+    if cursor is None:
+        return None
+    return _decode(cursor)["after"]
+
+
+def decode_date_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """``(date, primary key)`` to continue after for date-ordered lists."""
+    if cursor is None:
+        return None
+    payload = _decode(cursor)
+    try:
+        return datetime.fromisoformat(payload["date"]), payload["after"]
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def next_cursor(items, key: str, limit: int, date_key: Optional[str] = None) -> Optional[str]:
+    """Cursor for the page after ``items``, or ``None`` when it was the last one."""
+    if limit <= 0 or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(getattr(last, key), getattr(last, date_key) if date_key else None)
+
+
+def cursor_headers(cursor: Optional[str]) -> Dict[str, str]:
+    """Response headers advertising ``cursor``; empty on the last page."""
+    return {NEXT_CURSOR_HEADER: cursor} if cursor is not None else {}
@@ -0,0 +1,184 @@
+"""Monthly range partitions of ``activity_logs`` on PostgreSQL.
+
+Since revision f2a7c5d31e88 ``activity_logs`` is partitioned by month on
+``date``: date-bounded queries only scan the months they touch, and old
+months are removed by detaching their partition instead of deleting rows.
+Rows outside every monthly partition land in ``activity_logs_default``;
+``ensure`` creates partitions for the coming months and for any month found
+in the default partition, moving those rows into place.
+
+The running totals and rollups count every raw log with a user, so a month
+is only detached once ``retention`` has folded its logs into compacted days;
+a partition still holding such logs is refused. Logs without a user are
+counted nowhere and may go with it.
+
+Usage:
+    python -m backend.app.partitions ensure --months-ahead 3
+    python -m backend.app.partitions list
+    python -m backend.app.partitions detach --before 2024-01-01 [--drop]
+"""
+import argparse
+import re
+from datetime import date, datetime
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+PARTITIONED_TABLE = "activity_logs"
+
+# Partitions created ahead of the current month by each run of the job
+MONTHS_AHEAD = 3
+
+
+def month_start(value) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime, table: str = PARTITIONED_TABLE) -> str:
+    return f"{table}_y{month:%Y}m{month:%m}"
+
+
+def default_partition_name(table: str = PARTITIONED_TABLE) -> str:
+    return f"{table}_default"
+
+
+def is_partitioned(db: Session, table: str = PARTITIONED_TABLE) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table))"),
+        {"table": table}
+    ).scalar()
+
+
+def _exists(db: Session, name: str) -> bool:
+    return db.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+
+
+def list_partitions(db: Session, table: str = PARTITIONED_TABLE) -> List[dict]:
+    """Attached partitions of ``table`` with their bounds, in name order."""
+    rows = db.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+    ), {"table": table})
+    return [{"name": name, "bound": bound} for name, bound in rows]
+
+
+def monthly_partitions(db: Session, table: str = PARTITIONED_TABLE) -> Dict[datetime, str]:
+    """Attached monthly partitions of ``table`` keyed by the first day of their month."""
+    pattern = re.compile(rf"^{re.escape(table)}_y(\d{{4}})m(\d{{2}})$")
+    months = {}
+    for partition in list_partitions(db, table):
+        match = pattern.match(partition["name"])
+        if match:
+            months[datetime(int(match.group(1)), int(match.group(2)), 1)] = partition["name"]
+    return months
+
+
+def create_partition(db: Session, month: datetime, table: str = PARTITIONED_TABLE) -> bool:
+    """Create the partition for ``month`` unless it exists; rows already in the default partition move into it."""
+    name = partition_name(month, table)
+    if _exists(db, name):
+        return False
+    default = default_partition_name(table)
+    bounds = f"FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+    in_month = {"start": month, "end": add_months(month, 1)}
+    stranded = _exists(db, default) and db.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE date >= :start AND date < :end)"), in_month
+    ).scalar()
+    if not stranded:
+        db.execute(text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"))
+        return True
+    # A new partition may not overlap rows held by the default partition, so
+    # build it detached, move the month's rows over, then attach it
+    db.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.execute(text(
+        f"WITH moved AS (DELETE FROM {default} WHERE date >= :start AND date < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), in_month)
+    db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    return True
+
+
+def ensure_partitions(db: Session, months_ahead: int = MONTHS_AHEAD, today: Optional[date] = None,
+                      table: str = PARTITIONED_TABLE) -> List[str]:
+    """Create partitions up to ``months_ahead`` months past ``today`` and for every month in the default partition.
+
+    Returns the names of the partitions created; does nothing unless ``table``
+    is partitioned.
+    """
+    if not is_partitioned(db, table):
+        return []
+    current = month_start(today or datetime.utcnow())
+    months = {add_months(current, offset) for offset in range(months_ahead + 1)}
+    default = default_partition_name(table)
+    if _exists(db, default):
+        months.update(month_start(row[0]) for row in db.execute(
+            text(f"SELECT DISTINCT date_trunc('month', date) FROM {default}")
+        ))
+    return [partition_name(month, table) for month in sorted(months) if create_partition(db, month, table)]
+
+
+def detach_partitions_before(db: Session, cutoff, drop: bool = False, table: str = PARTITIONED_TABLE) -> List[str]:
+    """Detach (and with ``drop`` also drop) the monthly partitions that end on or before ``cutoff``'s month.
+
+    Raises ``ValueError`` for a partition that still holds logs with a user,
+    which the totals count; the caller rolls back, keeping every partition.
+    """
+    limit = month_start(cutoff)
+    detached = []
+    for month, name in sorted(monthly_partitions(db, table).items()):
+        if add_months(month, 1) > limit:
+            break
+        db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        # Checked once detached: the partition is locked then, so no log can be added after the check
+        if db.execute(text(f"SELECT EXISTS (SELECT 1 FROM {name} WHERE user_id IS NOT NULL)")).scalar():
+            raise ValueError(f"{name} still holds activity logs counted in the totals; compact them with retention first")
+        if drop:
+            db.execute(text(f"DROP TABLE {name}"))
+        detached.append(name)
+    return detached
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the monthly partitions of activity_logs.")
+    parser.add_argument("command", choices=["ensure", "list", "detach"])
+    parser.add_argument("--months-ahead", type=int, default=MONTHS_AHEAD, help="partitions to keep ready past this month")
+    parser.add_argument("--before", type=date.fromisoformat, help="detach months that end on or before this date's month")
+    parser.add_argument("--drop", action="store_true", help="drop detached partitions instead of keeping them as tables")
+    args = parser.parse_args(argv)
+    if args.command == "detach" and args.before is None:
+        parser.error("detach needs --before")
+
+    from backend.app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if not is_partitioned(db):
+            raise SystemExit(f"{PARTITIONED_TABLE} is not partitioned; run `alembic upgrade head` first")
+        if args.command == "ensure":
+            created = ensure_partitions(db, args.months_ahead)
+            db.commit()
+            print(f"Created {len(created)} partitions: {', '.join(created) or '-'}")
+        elif args.command == "detach":
+            try:
+                detached = detach_partitions_before(db, args.before, args.drop)
+            except ValueError as e:
+                db.rollback()
+                raise SystemExit(str(e))
+            db.commit()
+            print(f"{'Dropped' if args.drop else 'Detached'} {len(detached)} partitions: {', '.join(detached) or '-'}")
+        else:
+            for partition in list_partitions(db):
+                print(f"{partition['name']}\t{partition['bound']}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
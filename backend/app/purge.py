@@ -0,0 +1,107 @@
+"""Purge a user with a large history in bounded chunks.
+
+Deleting a user cascades to every row that references them, but for a user
+with hundreds of thousands of activity logs that single DELETE holds its
+locks and bloats one transaction for as long as it runs. ``purge_user``
+instead deletes the user's rows table by table, ``batch_size`` rows per
+transaction, and only then deletes the user, which by then cascades to
+whatever was added in the meantime. Archived logs, which have no foreign
+key, are purged as well.
+
+While a purge runs, the user's emission total and breakdown still show
+their whole history, since the running totals are only removed along with
+the user at the end; their emission series shrink as the rollups go.
+
+Usage:
+    python -m backend.app.purge 42
+    python -m backend.app.purge 42 --batch-size 5000
+"""
+import argparse
+import logging
+import time
+from typing import Dict
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.orm import Session
+from backend.app.models import (
+    Achievement, ActivityLog, ArchivedActivityLog, CompactedActivityLog, EmissionRollup, Goal, Report, Tip
+)
+import backend.app.crud as crud
+import backend.app.etags as etags
+
+# Rows deleted per transaction
+PURGE_BATCH_SIZE = 5000
+
+# (model, columns identifying a row); activity_logs rows are found by (log_id, date)
+# so each delete is pruned to the partitions the chunk falls in
+PURGE_STEPS = (
+    (ActivityLog, (ActivityLog.log_id, ActivityLog.date)),
+    (ArchivedActivityLog, (ArchivedActivityLog.log_id,)),
+    (CompactedActivityLog, (CompactedActivityLog.activity_type, CompactedActivityLog.day)),
+    (EmissionRollup, (EmissionRollup.granularity, EmissionRollup.bucket_start, EmissionRollup.activity_type)),
+    (Goal, (Goal.goal_id,)),
+    (Report, (Report.report_id,)),
+    (Achievement, (Achievement.achievement_id,)),
+    (Tip, (Tip.tip_id,)),
+)
+
+logger = logging.getLogger(__name__)
+
+
+def delete_chunk(db: Session, model, keys, user_id: int, batch_size: int = PURGE_BATCH_SIZE) -> int:
+    """Delete up to ``batch_size`` of ``user_id``'s rows from ``model`` without committing; returns the number deleted."""
+    chunk = select(*keys).where(model.user_id == user_id).limit(batch_size)
+    key = keys[0] if len(keys) == 1 else tuple_(*keys)
+    result = db.execute(delete(model).where(model.user_id == user_id, key.in_(chunk)).execution_options(synchronize_session=False))
+    return result.rowcount
+
+
+def purge_user(db: Session, user_id: int, batch_size: int = PURGE_BATCH_SIZE) -> Dict[str, int]:
+    """Delete ``user_id``'s rows in chunks of ``batch_size``, committing after each, then the user.
+
+    Returns the rows deleted per table; ``users`` is 0 when the user did not
+    exist.
+    """
+    deleted = {}
+    for model, keys in PURGE_STEPS:
+        deleted[model.__tablename__] = 0
+        while True:
+            try:
+                count = delete_chunk(db, model, keys, user_id, batch_size)
+                if model is Tip and count:
+                    etags.bump(db, etags.TIPS)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            deleted[model.__tablename__] += count
+            if count < batch_size:
+                break
+    deleted["users"] = int(crud.delete_user(db, user_id) is not None)
+    return deleted
+
+
+def purge_user_in_background(bind, user_id: int, batch_size: int = PURGE_BATCH_SIZE) -> Dict[str, int]:
+    """``purge_user`` on a session of its own, for a background task started by a request."""
+    started = time.perf_counter()
+    with Session(bind=bind) as db:
+        deleted = purge_user(db, user_id, batch_size)
+    logger.info("Purged user %d in %.2fs: %s", user_id, time.perf_counter() - started, deleted)
+    return deleted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Delete a user and all of their data in bounded chunks.")
+    parser.add_argument("user_id", type=int, help="user to purge")
+    parser.add_argument("--batch-size", type=int, default=PURGE_BATCH_SIZE, help="rows deleted per transaction")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    from backend.app.database import get_engine
+
+    deleted = purge_user_in_background(get_engine(), args.user_id, args.batch_size)
+    if not deleted["users"]:
+        raise SystemExit(f"User {args.user_id} not found")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Retention policy for raw activity logs.
+
+Logs dated before the horizon are folded into ``compacted_activity_logs``,
+one row per (user, activity_type, day) holding the summed value, emissions
+and log count, and the raw rows are then deleted, or moved to
+``activity_log_archive``. Work is done in batches of ``batch_size`` logs,
+each in a transaction of its own, so no lock is held for longer than one
+batch; on PostgreSQL rows locked by other writers are skipped until the
+next run.
+
+The running totals and rollups already count these logs and are left
+alone. Emission reads, goal checks, rebuilds and verification combine the
+compacted days with the raw logs that are left. A compacted day keeps the
+emissions worked out with the factors in effect when it was compacted.
+
+Logs without a user are left in place: there is no user to compact them
+under, and no totals count them.
+
+Usage:
+    python -m backend.app.retention --older-than-days 365
+    python -m backend.app.retention --older-than-days 365 --archive --batch-size 5000
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import insert, literal, select
+from sqlalchemy.orm import Session
+from backend.app.models import ActivityLog, ArchivedActivityLog, CompactedActivityLog
+import backend.app.emission_totals as emission_totals
+import backend.app.factor_registry as factor_registry
+
+# Logs newer than this many days are never compacted
+RETENTION_DAYS = 365
+
+# Raw logs folded and removed per transaction
+RETENTION_BATCH_SIZE = 5000
+
+ARCHIVE_COLUMNS = ("log_id", "user_id", "activity_type", "activity_value", "date")
+
+logger = logging.getLogger(__name__)
+
+
+def retention_cutoff(days: int = RETENTION_DAYS, now: Optional[datetime] = None) -> datetime:
+    """Start of the UTC day ``days`` days ago; logs before it are compacted."""
+    return emission_totals.bucket_start((now or datetime.utcnow()) - timedelta(days=days), "day")
+
+
+def compact_batch(db: Session, cutoff: datetime, batch_size: int = RETENTION_BATCH_SIZE, archive: bool = False) -> int:
+    """Fold up to ``batch_size`` logs dated before ``cutoff`` into daily rows and remove them, without committing.
+
+    Returns the number of logs compacted; 0 once nothing is left to do.
+    """
+    logs = db.query(ActivityLog.log_id, ActivityLog.user_id, ActivityLog.activity_type, ActivityLog.activity_value, ActivityLog.date).filter(
+        ActivityLog.date < cutoff, ActivityLog.user_id.isnot(None)
+    ).order_by(ActivityLog.date, ActivityLog.log_id).limit(batch_size).with_for_update(skip_locked=True).all()
+    if not logs:
+        return 0
+
+    snapshot = factor_registry.get_snapshot(db)
+    deltas = emission_totals.new_deltas()
+    for log in logs:
+        emission_totals.log_delta(deltas, log.user_id, log.activity_type, log.activity_value, log.date, snapshot)
+    rows = [
+        {"user_id": user_id, "activity_type": activity_type, "day": day, "total_value": value, "total_emissions": emissions, "log_count": count}
+        for (user_id, activity_type, day), (value, emissions, count) in sorted(deltas.items())
+    ]
+    emission_totals.upsert_sums(db, CompactedActivityLog, ["user_id", "activity_type", "day"], rows, ["total_value", "total_emissions", "log_count"])
+
+    log_ids = [log.log_id for log in logs]
+    # The date bound lets a partitioned activity_logs prune to the old months
+    batch = (ActivityLog.log_id.in_(log_ids), ActivityLog.date < cutoff)
+    if archive:
+        columns = [getattr(ActivityLog, column) for column in ARCHIVE_COLUMNS]
+        db.execute(insert(ArchivedActivityLog).from_select(
+            ARCHIVE_COLUMNS + ("archived_at",),
+            select(*columns, literal(datetime.utcnow())).where(*batch)
+        ))
+    db.query(ActivityLog).filter(*batch).delete(synchronize_session=False)
+    return len(logs)
+
+
+def compact_logs(db: Session, cutoff: datetime, batch_size: int = RETENTION_BATCH_SIZE, archive: bool = False,
+                 max_batches: Optional[int] = None) -> int:
+    """Compact every log dated before ``cutoff``, committing after each batch; returns the number of logs compacted."""
+    compacted = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        try:
+            count = compact_batch(db, cutoff, batch_size, archive)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        if not count:
+            break
+        compacted += count
+        batches += 1
+    return compacted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fold old activity logs into daily rows and delete or archive them.")
+    parser.add_argument("--older-than-days", type=int, default=RETENTION_DAYS, help="keep raw logs for this many days")
+    parser.add_argument("--batch-size", type=int, default=RETENTION_BATCH_SIZE, help="logs compacted per transaction")
+    parser.add_argument("--max-batches", type=int, help="stop after this many batches")
+    parser.add_argument("--archive", action="store_true", help="move raw logs to activity_log_archive instead of deleting them")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    from backend.app.database import SessionLocal
+
+    cutoff = retention_cutoff(args.older_than_days)
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        compacted = compact_logs(db, cutoff, args.batch_size, args.archive, args.max_batches)
+    finally:
+        db.close()
+    logger.info("Compacted %d logs dated before %s in %.2fs", compacted, cutoff.date(), time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
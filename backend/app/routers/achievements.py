@@ -1,30 +1,33 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
-from backend.app.database import get_db
-from backend.app.schemas import AchievementCreate, AchievementOut
+from typing import List, Optional
+from backend.app.database import get_db, get_read_db
+from backend.app.schemas import AchievementCreate, AchievementOut, AchievementListResponse, AchievementResponse
 import backend.app.crud as crud
+from backend.app import pagination, serialization
 
 router = APIRouter()
 
-@router.get("/")
-def read_achievements(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    achievements = crud.get_achievements(db=db, skip=skip, limit=limit)
-    return {"status": "success", "achievements": achievements}
+@router.get("/", response_model=AchievementListResponse)
+def read_achievements(skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    achievements = crud.get_achievements(db=db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor))
+    next_cursor = pagination.next_cursor(achievements, "achievement_id", limit)
+    content = {"status": "success", "achievements": achievements, "next_cursor": next_cursor}
+    return serialization.json_response(AchievementListResponse, content, headers=pagination.cursor_headers(next_cursor))
 
-@router.post("/", status_code=201)
+@router.post("/", response_model=AchievementResponse, status_code=201)
 def create_achievement_endpoint(achievement: AchievementCreate, db: Session = Depends(get_db)):
     new_achievement = crud.create_achievement(db=db, achievement=achievement)
     return {"status": "success", "achievement": new_achievement}
 
-@router.get("/{achievement_id}")
-def read_achievement(achievement_id: int, db: Session = Depends(get_db)):
+@router.get("/{achievement_id}", response_model=AchievementResponse)
+def read_achievement(achievement_id: int, db: Session = Depends(get_read_db)):
     db_achievement = crud.get_achievement(db, achievement_id)
     if db_achievement is None:
         raise HTTPException(status_code=404, detail="Achievement not found")
     return {"status": "success", "achievement": db_achievement}
 
-@router.put("/{achievement_id}")
+@router.put("/{achievement_id}", response_model=AchievementResponse)
 def update_achievement_endpoint(achievement_id: int, achievement: AchievementCreate, db: Session = Depends(get_db)):
     db_achievement = crud.update_achievement(db, achievement_id, achievement)
     if db_achievement is None:
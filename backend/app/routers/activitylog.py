@@ -1,42 +1,74 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import io
+from fastapi import APIRouter, Body, Depends, File, HTTPException, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from backend.app.database import get_db
-from backend.app.schemas import ActivityLogCreate, ActivityLogUpdate, ActivityLog
+from typing import Any, List, Optional
+from backend.app.database import get_async_db, get_async_read_db, get_db
+from backend.app.schemas import ActivityLogCreate, ActivityLogUpdate, ActivityLog, ActivityLogBatchResult, ActivityLogImportSummary
+import backend.app.async_crud as async_crud
 import backend.app.crud as crud
+from backend.app import importer, pagination, serialization
 
 router = APIRouter()
 
+# Upper bound on items accepted by a single batch request
+MAX_BATCH_SIZE = 10000
+
 @router.post("/", response_model=ActivityLog, status_code=201)
-def create_activity_log(activity_log: ActivityLogCreate, db: Session = Depends(get_db)):
-    created_activity_log = crud.create_activity_log(db=db, activity_log=activity_log)
+async def create_activity_log(activity_log: ActivityLogCreate, db: AsyncSession = Depends(get_async_db)):
+    created_activity_log = await async_crud.create_activity_log(db=db, activity_log=activity_log)
     if not created_activity_log:
         raise HTTPException(status_code=400, detail="Failed to create activity log")
     return created_activity_log
 
+@router.post("/batch", response_model=ActivityLogBatchResult, status_code=201)
+async def create_activity_logs_batch(activity_logs: List[Any] = Body(...), db: AsyncSession = Depends(get_async_db)):
+    if len(activity_logs) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_SIZE} items")
+    valid, errors = await async_crud.validate_activity_log_batch(db, activity_logs)
+    log_ids = await async_crud.bulk_create_activity_logs(db, [log for _, log in valid])
+    return {"created": len(log_ids), "log_ids": log_ids, "errors": errors}
+
+# Stays a sync handler: it reads the spooled upload with blocking file I/O
+@router.post("/import", response_model=ActivityLogImportSummary, status_code=201)
+def import_activity_logs(file: UploadFile = File(...), format: Optional[str] = None, chunk_size: int = crud.ACTIVITY_LOG_CHUNK_SIZE, db: Session = Depends(get_db)):
+    fmt = format or importer.detect_format(file.filename)
+    if fmt not in importer.IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported import format, expected one of {', '.join(importer.IMPORT_FORMATS)}")
+    if chunk_size < 1:
+        raise HTTPException(status_code=400, detail="chunk_size must be positive")
+    # The upload is spooled to disk by the multipart parser; read it back line by line
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", errors="replace", newline="")
+    try:
+        return importer.import_activity_logs(db, importer.iter_records(stream, fmt), chunk_size=chunk_size)
+    finally:
+        stream.detach()
+
 @router.get("/", response_model=list[ActivityLog])
-def read_activity_logs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_activity_logs(db, skip=skip, limit=limit)
+async def read_activity_logs(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_read_db)):
+    activity_logs = await async_crud.get_activity_logs(db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor))
+    headers = pagination.cursor_headers(pagination.next_cursor(activity_logs, "log_id", limit))
+    return serialization.json_response(List[ActivityLog], activity_logs, headers=headers)
 
 @router.get("/{log_id}", response_model=ActivityLog)
-def read_activity_log(log_id: int, db: Session = Depends(get_db)):
-    db_activity_log = crud.get_activity_log(db, log_id=log_id)
+async def read_activity_log(log_id: int, db: AsyncSession = Depends(get_async_read_db)):
+    db_activity_log = await async_crud.get_activity_log(db, log_id=log_id)
     if db_activity_log is None:
         raise HTTPException(status_code=404, detail="Activity log not found")
     return db_activity_log
 
 @router.put("/{log_id}", response_model=ActivityLog)
-def update_activity_log(log_id: int, activity_log: ActivityLogUpdate, db: Session = Depends(get_db)):
-    db_activity_log = crud.get_activity_log(db, log_id=log_id)
+async def update_activity_log(log_id: int, activity_log: ActivityLogUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_activity_log = await async_crud.update_activity_log(db=db, log_id=log_id, activity_log=activity_log)
     if db_activity_log is None:
         raise HTTPException(status_code=404, detail="Activity log not found")
-    return crud.update_activity_log(db=db, log_id=log_id, activity_log=activity_log)
+    return db_activity_log
 
 @router.delete("/{log_id}", response_model=ActivityLog)
-def delete_activity_log(log_id: int, db: Session = Depends(get_db)):
-    db_activity_log = crud.get_activity_log(db, log_id=log_id)
+async def delete_activity_log(log_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_activity_log = await async_crud.delete_activity_log(db=db, log_id=log_id)
     if db_activity_log is None:
         raise HTTPException(status_code=404, detail="Activity log not found")
-    return crud.delete_activity_log(db=db, log_id=log_id)
+    return db_activity_log
 
 
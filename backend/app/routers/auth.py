@@ -1,13 +1,11 @@
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from backend.app.schemas import UserCreate, UserOut
 from fastapi import Depends, HTTPException, status, APIRouter
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from backend.app.database import get_db
-from backend.app.schemas import UserCreate, UserOut
-import backend.app.crud as crud
+from backend.app.database import get_async_db
+import backend.app.async_crud as async_crud
+import backend.app.hashing as hashing
 from fastapi.security import OAuth2PasswordRequestForm
 import logging
 
@@ -27,39 +25,40 @@ SECRET_KEY = "simpletestkey12345"
 ALGORITHM = 'HS256'
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Use argon2 for password hashing
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
-
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+# Passwords are hashed with argon2 in the bounded pool in backend.app.hashing; a full pool answers 503
+def hashing_busy() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Too many logins in progress, retry shortly",
+                         headers={"Retry-After": "1"})
 
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
+    # python-jose is only imported once someone logs in
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
-        expire = datetime.now(datetime.UTC) + expires_delta
+        expire = datetime.now(timezone.utc) + expires_delta
     else:
-        expire = datetime.now(datetime.UTC) + timedelta(minutes=15)
+        expire = datetime.now(timezone.utc) + timedelta(minutes=15)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     try:
-        db_user = crud.get_user_by_email(db, user.email)
+        db_user = await async_crud.get_user_by_email(db, user.email)
         if db_user:
             raise HTTPException(status_code=400, detail="Email already registered")
 
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await hashing.hash_password(user.password)
         user.password = hashed_password
 
-        new_user = crud.create_user(db=db, user=user)
+        new_user = await async_crud.create_user(db=db, user=user)
         return UserOut.model_validate(new_user)  # Using Pydantic model for serialization
 
+    except hashing.HashingBusy:
+        raise hashing_busy()
     except HTTPException as http_exc:
         logging.error(f"HTTP error during user registration: {http_exc.detail}")
         raise
@@ -69,17 +68,19 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
 
     
 @router.post("/login")
-def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    db_user = crud.get_user_by_email(db, form_data.username)
-    if not db_user or not verify_password(form_data.password, db_user.password):
+async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    db_user = await async_crud.get_user_by_email(db, form_data.username)
+    if not db_user:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+    try:
+        valid, new_hash = await hashing.verify_and_update(form_data.password, db_user.password)
+    except hashing.HashingBusy:
+        raise hashing_busy()
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
+    if new_hash is not None:
+        # Hashed with an older argon2 cost; store the rehash while the password is at hand
+        await async_crud.update_user_password(db, db_user.user_id, new_hash)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(data={"sub": db_user.email}, expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
-
-
-
-
-
-# Logging the errors here 
-logging.basicConfig(level=logging.DEBUG)
\ No newline at end of file
@@ -1,30 +1,41 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from typing import List
-from backend.app.database import get_db
+from typing import List, Optional
+from backend.app.database import get_db, get_read_db
 from backend.app.schemas import EmissionFactor, EmissionFactorCreate
 import backend.app.crud as crud
+from backend.app import emission_totals, etags, pagination, serialization
 
 router = APIRouter()
 
+# The stored totals of the factor's activity type are recomputed after the response is sent
 @router.post("/", response_model=EmissionFactor, status_code=201)
-def create_emission_factor(emission_factor: EmissionFactorCreate, db: Session = Depends(get_db)):
-    return crud.create_emission_factor(db=db, emission_factor=emission_factor)
+def create_emission_factor(emission_factor: EmissionFactorCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    db_emission_factor = crud.create_emission_factor(db=db, emission_factor=emission_factor)
+    background_tasks.add_task(emission_totals.recompute_in_background, db.get_bind(), [db_emission_factor.activity_type])
+    return db_emission_factor
 
 @router.get("/{factor_id}", response_model=EmissionFactor)
-def read_emission_factor(factor_id: int, db: Session = Depends(get_db)):
+def read_emission_factor(factor_id: int, db: Session = Depends(get_read_db)):
     db_emission_factor = crud.get_emission_factor(db, factor_id)
     if db_emission_factor is None:
         raise HTTPException(status_code=404, detail="Emission Factor not found")
     return db_emission_factor
 
 @router.get("/", response_model=List[EmissionFactor])
-def read_emission_factors(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_emission_factors(db=db, skip=skip, limit=limit)
+def read_emission_factors(request: Request, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    etag = etags.current_etag(db, etags.EMISSION_FACTORS, request)
+    if etags.is_fresh(request, etag):
+        return etags.not_modified(etag)
+    emission_factors = crud.get_emission_factors(db=db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor))
+    headers = pagination.cursor_headers(pagination.next_cursor(emission_factors, "factor_id", limit))
+    headers["ETag"] = etag
+    return serialization.json_response(List[EmissionFactor], emission_factors, headers=headers)
 
 @router.delete("/{factor_id}", response_model=EmissionFactor)
-def delete_emission_factor(factor_id: int, db: Session = Depends(get_db)):
+def delete_emission_factor(factor_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     db_emission_factor = crud.delete_emission_factor(db=db, factor_id=factor_id)
     if db_emission_factor is None:
         raise HTTPException(status_code=404, detail="Emission Factor not found")
+    background_tasks.add_task(emission_totals.recompute_in_background, db.get_bind(), [db_emission_factor.activity_type])
     return db_emission_factor
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
-from backend.app.database import get_db
+from typing import List, Optional
+from backend.app.database import get_db, get_read_db
 from backend.app.schemas import Goal, GoalCreate, GoalUpdate
 import backend.app.crud as crud
+from backend.app import pagination, serialization
 
 router = APIRouter()
 
@@ -13,11 +14,13 @@ def create_goal(goal: GoalCreate, db: Session = Depends(get_db)):
     return created_goal
 
 @router.get("/", response_model=List[Goal])
-def read_goals(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_goals(db, skip=skip, limit=limit)
+def read_goals(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    goals = crud.get_goals(db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor))
+    headers = pagination.cursor_headers(pagination.next_cursor(goals, "goal_id", limit))
+    return serialization.json_response(List[Goal], goals, headers=headers)
 
 @router.get("/{goal_id}", response_model=Goal)
-def read_goal(goal_id: int, db: Session = Depends(get_db)):
+def read_goal(goal_id: int, db: Session = Depends(get_read_db)):
     db_goal = crud.get_goal(db, goal_id=goal_id)
     if db_goal is None:
         raise HTTPException(status_code=404, detail="Goal not found")
@@ -25,14 +28,14 @@ def read_goal(goal_id: int, db: Session = Depends(get_db)):
 
 @router.put("/{goal_id}", response_model=Goal)
 def update_goal(goal_id: int, goal: GoalUpdate, db: Session = Depends(get_db)):
-    db_goal = crud.get_goal(db, goal_id=goal_id)
+    db_goal = crud.update_goal(db=db, goal_id=goal_id, goal=goal)
     if db_goal is None:
         raise HTTPException(status_code=404, detail="Goal not found")
-    return crud.update_goal(db=db, goal_id=goal_id, goal=goal)
+    return db_goal
 
 @router.delete("/{goal_id}", response_model=Goal)
 def delete_goal(goal_id: int, db: Session = Depends(get_db)):
-    db_goal = crud.get_goal(db, goal_id=goal_id)
+    db_goal = crud.delete_goal(db=db, goal_id=goal_id)
     if db_goal is None:
         raise HTTPException(status_code=404, detail="Goal not found")
-    return crud.delete_goal(db=db, goal_id=goal_id)
+    return db_goal
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from typing import Dict
+import backend.app.database as database
+from backend.app.pool_metrics import pool_stats
+from backend.app.schemas import PoolStats
+
+router = APIRouter()
+
+@router.get("/pool", response_model=Dict[str, PoolStats])
+def read_pool_stats():
+    # Per worker process: each one owns its engines and pools
+    stats = {"sync": pool_stats(database.get_engine()), "async": pool_stats(database.get_async_engine())}
+    if database.get_replica_engine() is not None:
+        stats["replica"] = pool_stats(database.get_replica_engine())
+    if database.get_async_replica_engine() is not None:
+        stats["async_replica"] = pool_stats(database.get_async_replica_engine())
+    return stats
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
-from backend.app.database import get_db
+from typing import List, Optional
+from backend.app.database import get_db, get_read_db
 from backend.app.schemas import ReportCreate, ReportBase, Report
 import backend.app.crud as crud
+from backend.app import pagination, serialization
 
 router = APIRouter()
 
@@ -15,11 +16,13 @@ def create_report(report: ReportBase, db: Session = Depends(get_db)):
     return created_report
 
 @router.get("/", response_model=List[Report])
-def read_reports(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    return crud.get_reports(db, skip=skip, limit=limit)
+def read_reports(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    reports = crud.get_reports(db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor))
+    headers = pagination.cursor_headers(pagination.next_cursor(reports, "report_id", limit))
+    return serialization.json_response(List[Report], reports, headers=headers)
 
 @router.get("/{report_id}", response_model=Report)
-def read_report(report_id: int, db: Session = Depends(get_db)):
+def read_report(report_id: int, db: Session = Depends(get_read_db)):
     db_report = crud.get_report(db, report_id=report_id)
     if db_report is None:
         raise HTTPException(status_code=404, detail="Report not found")
@@ -27,14 +30,14 @@ def read_report(report_id: int, db: Session = Depends(get_db)):
 
 @router.put("/{report_id}", response_model=Report)
 def update_report(report_id: int, report: ReportBase, db: Session = Depends(get_db)):
-    db_report = crud.get_report(db, report_id=report_id)
+    db_report = crud.update_report(db=db, report_id=report_id, report=report)
     if db_report is None:
         raise HTTPException(status_code=404, detail="Report not found")
-    return crud.update_report(db=db, report_id=report_id, report=report)
+    return db_report
 
 @router.delete("/{report_id}", response_model=Report)
 def delete_report(report_id: int, db: Session = Depends(get_db)):
-    db_report = crud.get_report(db, report_id=report_id)
+    db_report = crud.delete_report(db=db, report_id=report_id)
     if db_report is None:
         raise HTTPException(status_code=404, detail="Report not found")
-    return crud.delete_report(db=db, report_id=report_id)
+    return db_report
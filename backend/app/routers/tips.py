@@ -1,24 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from typing import List
-from backend.app.database import get_db
-from backend.app.schemas import TipCreate, Tip, TipBase
+from typing import List, Optional
+from backend.app.database import get_db, get_read_db
+from backend.app.schemas import TipCreate, Tip, TipBase, TipResponse
 import backend.app.crud as crud
+from backend.app import etags, pagination, serialization
 
 router = APIRouter()
 
 @router.get("/", response_model=List[Tip])
-def read_tips(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    tips = crud.get_tips(db=db, skip=skip, limit=limit)
-    return tips
+def read_tips(request: Request, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    etag = etags.current_etag(db, etags.TIPS, request)
+    if etags.is_fresh(request, etag):
+        return etags.not_modified(etag)
+    tips = crud.get_tips(db=db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor))
+    headers = pagination.cursor_headers(pagination.next_cursor(tips, "tip_id", limit))
+    headers["ETag"] = etag
+    return serialization.json_response(List[Tip], tips, headers=headers)
 
-@router.post("/", status_code=status.HTTP_201_CREATED)
+@router.post("/", response_model=TipResponse, status_code=status.HTTP_201_CREATED)
 def create_tip_endpoint(tip: TipCreate, db: Session = Depends(get_db)):
     new_tip = crud.create_tip(db=db, tip=tip)
     return {"status": "success", "tip": new_tip}
 
 @router.get("/{tip_id}", response_model=Tip)
-def read_tip(tip_id: int, db: Session = Depends(get_db)):
+def read_tip(tip_id: int, db: Session = Depends(get_read_db)):
     db_tip = crud.get_tip(db, tip_id)
     if db_tip is None:
         raise HTTPException(status_code=404, detail="Tip not found")
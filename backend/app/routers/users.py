@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from backend.app.database import get_db
-from backend.app.schemas import UserCreate, UserOut,Report, Tip, Goal
+from typing import List, Literal, Optional, Union
+from datetime import datetime
+from backend.app.database import get_async_read_db, get_db, get_read_db
+from backend.app.schemas import UserCreate, UserOut, UserBulkDelete, UserBulkDeleteResult, Report, Tip, Goal, EmissionsBreakdown, EmissionSeriesPoint, ActivityLog, AchievementOut, Dashboard
+import backend.app.async_crud as async_crud
 import backend.app.crud as crud
+from backend.app import etags, exporter, pagination, purge, serialization
 
 router = APIRouter()
 
+# Upper bound on users accepted by a single bulk request
+MAX_BULK_SIZE = 10000
+
 @router.get("/", response_model=List[UserOut])
-def read_users(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    users = crud.get_users(db=db, skip=skip, limit=limit)
-    return users
+def read_users(skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    users = crud.get_users(db=db, skip=skip, limit=limit, after_id=pagination.decode_cursor(cursor))
+    headers = pagination.cursor_headers(pagination.next_cursor(users, "user_id", limit))
+    return serialization.json_response(List[UserOut], users, headers=headers)
 
 # @router.post("/", status_code=status.HTTP_201_CREATED)
 # def create_user(user: UserCreate, db: Session = Depends(get_db)):
@@ -28,8 +37,21 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     except Exception as e:
         raise HTTPException(status_code=500, detail="Internal Server Error")
 
+@router.post("/bulk", response_model=List[UserOut])
+def bulk_upsert_users(users: List[UserCreate], db: Session = Depends(get_db)):
+    if len(users) > MAX_BULK_SIZE:
+        raise HTTPException(status_code=413, detail=f"Bulk request exceeds {MAX_BULK_SIZE} users")
+    return serialization.json_response(List[UserOut], crud.bulk_upsert_users(db, users))
+
+@router.post("/bulk-delete", response_model=UserBulkDeleteResult)
+def bulk_delete_users(request: UserBulkDelete, db: Session = Depends(get_db)):
+    if len(request.user_ids) > MAX_BULK_SIZE:
+        raise HTTPException(status_code=413, detail=f"Bulk request exceeds {MAX_BULK_SIZE} users")
+    user_ids = crud.bulk_delete_users(db, request.user_ids)
+    return {"deleted": len(user_ids), "user_ids": user_ids}
+
 @router.get("/{user_id}", response_model=UserOut)
-def read_user(user_id: int, db: Session = Depends(get_db)):
+def read_user(user_id: int, db: Session = Depends(get_read_db)):
     db_user = crud.get_user(db, user_id)
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -49,23 +71,144 @@ def delete_user_endpoint(user_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted successfully"}
 
+# Deletes a large history in bounded chunks after the response is sent
+@router.post("/{user_id}/purge", status_code=status.HTTP_202_ACCEPTED)
+def purge_user_endpoint(user_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    if crud.get_user(db, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    background_tasks.add_task(purge.purge_user_in_background, db.get_bind(), user_id)
+    return {"message": "User purge started"}
+
 # Endpoints for additional functions 
 # New Endpoints for Additional Functions
-@router.get("/{user_id}/emissions", response_model=float)
-def read_user_emissions(user_id: int, db: Session = Depends(get_db)):
+@router.get("/{user_id}/emissions", response_model=Union[float, EmissionsBreakdown])
+def read_user_emissions(user_id: int, request: Request, response: Response, breakdown: bool = False, db: Session = Depends(get_read_db)):
+    etag = etags.current_etag(db, etags.user_emissions(user_id), request)
+    if etags.is_fresh(request, etag):
+        return etags.not_modified(etag)
+    response.headers["ETag"] = etag
+    if breakdown:
+        return crud.get_user_emissions_breakdown(db, user_id)
     total_emissions = crud.get_user_emissions(db, user_id)
     return total_emissions
 
+@router.get("/{user_id}/dashboard", response_model=Dashboard)
+async def read_user_dashboard(
+    user_id: int,
+    activities_limit: int = 10,
+    reports_limit: int = 5,
+    goals_limit: int = 5,
+    tips_limit: int = 5,
+    achievements_limit: int = 5,
+    parallel: bool = False,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    limits = {
+        "activities": activities_limit,
+        "reports": reports_limit,
+        "goals": goals_limit,
+        "tips": tips_limit,
+        "achievements": achievements_limit,
+    }
+    dashboard = await async_crud.get_user_dashboard(db, user_id, limits, parallel=parallel)
+    if dashboard is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return serialization.json_response(Dashboard, dashboard)
+
+@router.get("/{user_id}/export")
+def export_user_history(user_id: int, format: Literal["ndjson", "csv"] = "ndjson", db: Session = Depends(get_read_db)):
+    if crud.get_user(db, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return StreamingResponse(
+        exporter.stream_user_history(db.get_bind(), user_id, format),
+        media_type=exporter.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="user-{user_id}-history.{format}"'}
+    )
+
+@router.get("/{user_id}/emissions/series", response_model=List[EmissionSeriesPoint])
+def read_user_emissions_series(
+    user_id: int,
+    granularity: Literal["day", "week", "month"] = "day",
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    db: Session = Depends(get_read_db)
+):
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    return crud.get_user_emissions_series(db, user_id, granularity, start, end)
+
+def _read_user_page(db: Session, schema, list_rows, user_id: int, start, end, limit: int, cursor, key: str, date_key: str):
+    if start and end and start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if crud.get_user(db, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    rows = list_rows(db, user_id, start=start, end=end, limit=limit, after=pagination.decode_date_cursor(cursor))
+    headers = pagination.cursor_headers(pagination.next_cursor(rows, key, limit, date_key))
+    return serialization.json_response(schema, rows, headers=headers)
+
+@router.get("/{user_id}/activities", response_model=List[ActivityLog])
+def read_user_activities(
+    user_id: int,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    return _read_user_page(db, List[ActivityLog], crud.get_user_activity_logs, user_id, start, end, limit, cursor, "log_id", "date")
+
+@router.get("/{user_id}/goals", response_model=List[Goal])
+def read_user_goals(
+    user_id: int,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    return _read_user_page(db, List[Goal], crud.get_user_goals, user_id, start, end, limit, cursor, "goal_id", "deadline")
+
+@router.get("/{user_id}/reports", response_model=List[Report])
+def read_user_reports(
+    user_id: int,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    return _read_user_page(db, List[Report], crud.get_user_reports, user_id, start, end, limit, cursor, "report_id", "generated_date")
+
+@router.get("/{user_id}/achievements", response_model=List[AchievementOut])
+def read_user_achievements(
+    user_id: int,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    return _read_user_page(db, List[AchievementOut], crud.get_user_achievements, user_id, start, end, limit, cursor, "achievement_id", "date_awarded")
+
 @router.post("/{user_id}/emission_report", response_model=Report)
 def create_emission_report(user_id: int, db: Session = Depends(get_db)):
     report = crud.generate_emission_report(db, user_id)
     return report
 
+# Generates and stores new tips, so it runs on the primary; /tips/saved only reads them
 @router.get("/{user_id}/tips", response_model=List[Tip])
 def read_tips(user_id: int, db: Session = Depends(get_db)):
     tips = crud.provide_tips_to_user(db, user_id)
     return tips
 
+@router.get("/{user_id}/tips/saved", response_model=List[Tip])
+def read_user_saved_tips(user_id: int, limit: int = 100, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    if crud.get_user(db, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    tips = crud.get_user_tips(db, user_id, limit=limit, after_id=pagination.decode_cursor(cursor))
+    headers = pagination.cursor_headers(pagination.next_cursor(tips, "tip_id", limit))
+    return serialization.json_response(List[Tip], tips, headers=headers)
+
 @router.get("/{user_id}/goal_achievement", response_model=List[Goal])
 def read_goal_achievement(user_id: int, db: Session = Depends(get_db)):
     achieved_goals = crud.check_goal_achievement(db, user_id)
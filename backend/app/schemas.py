@@ -1,6 +1,6 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timezone
 
 # User schema
 class UserBase(BaseModel):
@@ -21,6 +21,19 @@ class UserOut(UserBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class UserBulkDelete(BaseModel):
+    user_ids: List[int]
+
+class UserBulkDeleteResult(BaseModel):
+    deleted: int
+    user_ids: List[int]
+
+def to_naive_utc(value):
+    # Timestamp columns are without time zone and hold UTC
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
 # ActivityLog schema
 class ActivityLogBase(BaseModel):
     user_id: int
@@ -28,6 +41,8 @@ class ActivityLogBase(BaseModel):
     activity_value: float
     date: datetime
 
+    _date_to_naive_utc = field_validator("date")(to_naive_utc)
+
 class ActivityLogCreate(ActivityLogBase):
     pass
 
@@ -42,10 +57,36 @@ class ActivityLog(ActivityLogBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class ActivityLogBatchError(BaseModel):
+    index: int
+    detail: Any
+
+class ActivityLogBatchResult(BaseModel):
+    created: int
+    log_ids: List[int]
+    errors: List[ActivityLogBatchError]
+
+class ActivityLogImportSummary(BaseModel):
+    imported: int
+    failed: int
+    errors: List[ActivityLogBatchError]
+    elapsed_seconds: float
+    rows_per_second: float
+
 # Emission Factor Schema 
 class EmissionFactorBase(BaseModel):
     activity_type: str
     emission_factor: float
+    valid_from: Optional[datetime] = None
+    valid_to: Optional[datetime] = None
+
+    _validity_to_naive_utc = field_validator("valid_from", "valid_to")(to_naive_utc)
+
+    @model_validator(mode="after")
+    def check_validity_period(self):
+        if self.valid_from is not None and self.valid_to is not None and self.valid_to <= self.valid_from:
+            raise ValueError("valid_to must be after valid_from")
+        return self
 
 class EmissionFactorCreate(EmissionFactorBase):
     pass
@@ -55,6 +96,16 @@ class EmissionFactor(EmissionFactorBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+# Emissions schema
+class EmissionsBreakdown(BaseModel):
+    total: float
+    by_activity_type: Dict[str, float]
+
+class EmissionSeriesPoint(BaseModel):
+    bucket_start: datetime
+    total_emissions: float
+    by_activity_type: Dict[str, float]
+
 # Goal schemas
 class GoalBase(BaseModel):
     user_id: int
@@ -90,6 +141,15 @@ class AchievementOut(AchievementBase):
 
     model_config = ConfigDict(from_attributes=True)
 
+class AchievementResponse(BaseModel):
+    status: str
+    achievement: AchievementOut
+
+class AchievementListResponse(BaseModel):
+    status: str
+    achievements: List[AchievementOut]
+    next_cursor: Optional[str] = None
+
 # Report Schema
 
 class ReportBase(BaseModel):
@@ -118,3 +178,32 @@ class Tip(TipBase):
     tip_id: int
 
     model_config = ConfigDict(from_attributes=True)
+
+class TipResponse(BaseModel):
+    status: str
+    tip: Tip
+
+# Dashboard schema
+class Dashboard(BaseModel):
+    user_id: int
+    total_emissions: float
+    activities: List[ActivityLog]
+    reports: List[Report]
+    goals: List[Goal]
+    tips: List[Tip]
+    achievements: List[AchievementOut]
+
+# Connection pool schema
+class PoolStats(BaseModel):
+    pool_class: str
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    checked_out: Optional[int] = None
+    checked_in: Optional[int] = None
+    overflow: Optional[int] = None
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+    wait_seconds_p50: float = 0.0
+    wait_seconds_p95: float = 0.0
@@ -1,11 +1,5 @@
 import React, { useEffect, useState } from "react";
-import {
-  getUserActivities,
-  getUserReports,
-  getUserGoals,
-  getUserTips,
-  getUserAchievements,
-} from "../services/api";
+import { getUserDashboard } from "../services/app";
 
 const Dashboard = () => {
   const [activities, setActivities] = useState([]);
@@ -17,17 +11,14 @@ const Dashboard = () => {
   useEffect(() => {
     const fetchData = async () => {
       const userId = 1; // replace with actual user ID
-      const activitiesData = await getUserActivities(userId);
-      const reportsData = await getUserReports(userId);
-      const goalsData = await getUserGoals(userId);
-      const tipsData = await getUserTips(userId);
-      const achievementsData = await getUserAchievements(userId);
+      // All five sections come back in one response
+      const { data } = await getUserDashboard(userId);
 
-      setActivities(activitiesData.data);
-      setReports(reportsData.data);
-      setGoals(goalsData.data);
-      setTips(tipsData.data);
-      setAchievements(achievementsData.data);
+      setActivities(data.activities);
+      setReports(data.reports);
+      setGoals(data.goals);
+      setTips(data.tips);
+      setAchievements(data.achievements);
     };
 
     fetchData();
@@ -39,7 +30,7 @@ const Dashboard = () => {
       <div>
         <h2>Activities</h2>
         {activities.map((activity) => (
-          <div key={activity.id}>
+          <div key={activity.log_id}>
             {activity.activity_type}: {activity.activity_value}
           </div>
         ))}
@@ -47,13 +38,13 @@ const Dashboard = () => {
       <div>
         <h2>Reports</h2>
         {reports.map((report) => (
-          <div key={report.id}>{report.report_data}</div>
+          <div key={report.report_id}>{report.report_data}</div>
         ))}
       </div>
       <div>
         <h2>Goals</h2>
         {goals.map((goal) => (
-          <div key={goal.id}>
+          <div key={goal.goal_id}>
             {goal.target_reduction} by {goal.deadline}
           </div>
         ))}
@@ -61,13 +52,13 @@ const Dashboard = () => {
       <div>
         <h2>Tips</h2>
         {tips.map((tip) => (
-          <div key={tip.id}>{tip.tip_text}</div>
+          <div key={tip.tip_id}>{tip.tip_text}</div>
         ))}
       </div>
       <div>
         <h2>Achievements</h2>
         {achievements.map((achievement) => (
-          <div key={achievement.id}>
+          <div key={achievement.achievement_id}>
             {achievement.achievement_type} on {achievement.date_awarded}
           </div>
         ))}
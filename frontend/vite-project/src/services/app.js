@@ -49,6 +49,8 @@ export const createUserGoal = (userId, goalData) =>
 export const getUserTips = (userId) => api.get(`/users/${userId}/tips`);
 export const getUserAchievements = (userId) =>
   api.get(`/users/${userId}/achievements`);
+export const getUserDashboard = (userId, params) =>
+  api.get(`/users/${userId}/dashboard`, { params });
 
 export const createActivityLog = (activityData) =>
   api.post("/activity-logs/", activityData);